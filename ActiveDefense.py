@@ -1,45 +1,91 @@
+import queue
 import socket
+import selectors
+import struct
 import threading
 import logging
 import time
 
 logger = logging.getLogger(__name__)
 
+# struct linger {l_onoff=1, l_linger=0}
+_LINGER_RESET = struct.pack('ii', 1, 0)
+
 class ActiveDefense:
     """
     Spawns lightweight 'Honeyports' to detect scanners.
+
+    All listening sockets are multiplexed on one selector (epoll on Linux),
+    so a single background thread serves every honeyport. Alerts are queued
+    and logged from a separate thread, off the accept path.
     """
     def __init__(self, ports=[8080, 2222, 2121], banner=b"Internal Service Error 500: Check Logs\n"):
         self.ports = ports
         self.banner = banner
         self.active_listeners = []
         self.running = False
+        self._selector = None
+        self._log_q = queue.SimpleQueue()
 
     def start(self):
         self.running = True
+        self._selector = selectors.DefaultSelector()
         for port in self.ports:
-            t = threading.Thread(target=self._listen, args=(port,))
+            self._bind(port)
+
+        for target in (self._serve, self._drain_log):
+            t = threading.Thread(target=target)
             t.daemon = True
             t.start()
             self.active_listeners.append(t)
         logger.info(f"Active Defense Initialized on ports: {self.ports}")
 
-    def _listen(self, port):
+    def _bind(self, port):
         try:
             s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             s.bind(('0.0.0.0', port))
             s.listen(5)
-            while self.running:
-                conn, addr = s.accept()
-                logger.warning(f"[ACTIVE DEFENSE] ALERT: Connection to HONEYPORT {port} from {addr}")
-                # Fake banner to confuse attacker
-                try:
-                    conn.sendall(self.banner)
-                    conn.close()
-                except:
-                    pass
+            s.setblocking(False)
+            self._selector.register(s, selectors.EVENT_READ, port)
         except Exception as e:
             logger.error(f"Failed to bind honeyport {port}: {e}")
 
+    def _serve(self):
+        try:
+            while self.running:
+                # Timeout lets stop() take effect without a wake-up connection
+                for key, _ in self._selector.select(timeout=1.0):
+                    self._handle(key.fileobj, key.data)
+        finally:
+            for key in list(self._selector.get_map().values()):
+                key.fileobj.close()
+            self._selector.close()
+
+    def _handle(self, s, port):
+        try:
+            conn, addr = s.accept()
+        except OSError:
+            return  # Peer went away before we accepted
+        self._log_q.put_nowait((port, addr))
+        # Fake banner to confuse attacker. The banner fits in one segment, so
+        # a single non-blocking send is enough; a zero linger makes close()
+        # reset the connection instead of leaving it in TIME_WAIT.
+        try:
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RESET)
+            conn.send(self.banner, socket.MSG_DONTWAIT)
+        except:
+            pass
+        finally:
+            conn.close()
+
+    def _drain_log(self):
+        while True:
+            item = self._log_q.get()
+            if item is None:
+                break  # Sentinel from stop()
+            port, addr = item
+            logger.warning(f"[ACTIVE DEFENSE] ALERT: Connection to HONEYPORT {port} from {addr}")
+
     def stop(self):
         self.running = False
+        self._log_q.put(None)
@@ -11,14 +11,210 @@ This module implements countermeasures against common honeypot fingerprinting te
 
 import os
 import random
+import re
+import secrets
+import struct
+import sys
 import time
-import hashlib
 import logging
+from bisect import bisect_right
+from collections import deque
+from itertools import islice
 from datetime import datetime, timedelta
 
+try:
+    import ahocorasick  # Optional: pyahocorasick, for literal fingerprint patterns
+except ImportError:
+    ahocorasick = None
+
 logger = logging.getLogger(__name__)
 
 
+# Static file bodies, shared by every AntiFingerprintManager instance.
+# NOTE: UML honeypots have distinct /proc/mounts signatures - we avoid those
+_PROC_MOUNTS = """/dev/sda1 / ext4 rw,relatime,errors=remount-ro 0 0
+devtmpfs /dev devtmpfs rw,nosuid,size=4096k,nr_inodes=1048576,mode=755,inode64 0 0
+proc /proc proc rw,nosuid,nodev,noexec,relatime 0 0
+sysfs /sys sysfs rw,nosuid,nodev,noexec,relatime 0 0
+tmpfs /run tmpfs rw,nosuid,nodev,size=1630744k,nr_inodes=819200,mode=755,inode64 0 0
+tmpfs /dev/shm tmpfs rw,nosuid,nodev,inode64 0 0
+tmpfs /run/lock tmpfs rw,nosuid,nodev,noexec,relatime,size=5120k,inode64 0 0
+cgroup2 /sys/fs/cgroup cgroup2 rw,nosuid,nodev,noexec,relatime,nsdelegate,memory_recursiveprot 0 0
+"""
+
+_PROC_FILESYSTEMS = """nodev\tsysfs
+nodev\ttmpfs
+nodev\tbdev
+nodev\tproc
+nodev\tcgroup
+nodev\tcgroup2
+nodev\tcpuset
+nodev\tdevtmpfs
+nodev\tdevpts
+nodev\tsecurityfs
+nodev\tsockfs
+nodev\tdebugfs
+nodev\ttracefs
+nodev\thugetlbfs
+nodev\tmqueue
+nodev\tpstore
+nodev\tautofs
+\text3
+\text4
+\text2
+\tvfat
+\tfuseblk
+nodev\tfuse
+nodev\tfusectl
+nodev\tefivarfs
+"""
+
+_ETC_PASSWD = """root:x:0:0:root:/root:/bin/bash
+daemon:x:1:1:daemon:/usr/sbin:/usr/sbin/nologin
+bin:x:2:2:bin:/bin:/usr/sbin/nologin
+sys:x:3:3:sys:/dev:/usr/sbin/nologin
+sync:x:4:65534:sync:/bin:/bin/sync
+games:x:5:60:games:/usr/games:/usr/sbin/nologin
+man:x:6:12:man:/var/cache/man:/usr/sbin/nologin
+lp:x:7:7:lp:/var/spool/lpd:/usr/sbin/nologin
+mail:x:8:8:mail:/var/mail:/usr/sbin/nologin
+news:x:9:9:news:/var/spool/news:/usr/sbin/nologin
+uucp:x:10:10:uucp:/var/spool/uucp:/usr/sbin/nologin
+proxy:x:13:13:proxy:/bin:/usr/sbin/nologin
+www-data:x:33:33:www-data:/var/www:/usr/sbin/nologin
+backup:x:34:34:backup:/var/backups:/usr/sbin/nologin
+list:x:38:38:Mailing List Manager:/var/list:/usr/sbin/nologin
+irc:x:39:39:ircd:/run/ircd:/usr/sbin/nologin
+nobody:x:65534:65534:nobody:/nonexistent:/usr/sbin/nologin
+systemd-network:x:100:102:systemd Network Management,,,:/run/systemd:/usr/sbin/nologin
+systemd-resolve:x:101:103:systemd Resolver,,,:/run/systemd:/usr/sbin/nologin
+syslog:x:102:106::/home/syslog:/usr/sbin/nologin
+messagebus:x:103:107::/nonexistent:/usr/sbin/nologin
+_apt:x:104:65534::/nonexistent:/usr/sbin/nologin
+sshd:x:105:65534::/run/sshd:/usr/sbin/nologin
+dev_alice:x:1000:1000:Alice Developer,,,:/home/dev_alice:/bin/bash
+sys_bob:x:1001:1001:Bob SysAdmin,,,:/home/sys_bob:/bin/bash
+jenkins:x:1002:1002:Jenkins CI,,,:/var/lib/jenkins:/bin/bash
+"""
+
+# Encoded once at import for the bytes accessors; every instance hands out
+# these same objects. Keyed by path, value is (str content, bytes content).
+_STATIC_ENCODED = {
+    path: (content, content.encode("utf-8"))
+    for path, content in (
+        ("/proc/mounts", _PROC_MOUNTS),
+        ("/proc/filesystems", _PROC_FILESYSTEMS),
+        ("/etc/passwd", _ETC_PASSWD),
+    )
+}
+
+# Templates for the randomized files, rendered with str.format()
+_ETC_HOSTS_TEMPLATE = """127.0.0.1\tlocalhost
+127.0.1.1\t{hostname}
+
+# The following lines are desirable for IPv6 capable hosts
+::1     ip6-localhost ip6-loopback
+fe00::0 ip6-localnet
+ff00::0 ip6-mcastprefix
+ff02::1 ip6-allnodes
+ff02::2 ip6-allrouters
+"""
+
+_MEMINFO_TEMPLATE = """MemTotal:       {total_kb} kB
+MemFree:        {free_kb} kB
+MemAvailable:   {available_kb} kB
+Buffers:        {buffers_kb} kB
+Cached:         {cached_kb} kB
+SwapCached:     {swap_cached_kb} kB
+Active:         {active_kb} kB
+Inactive:       {inactive_kb} kB
+SwapTotal:      {swap_total_kb} kB
+SwapFree:       {swap_free_kb} kB
+Dirty:          {dirty_kb} kB
+Writeback:      0 kB
+AnonPages:      {anon_kb} kB
+Mapped:         {mapped_kb} kB
+Shmem:          {shmem_kb} kB
+"""
+
+_UPTIME_TEMPLATE = "{uptime:.2f} {idle:.2f}\n"
+
+_LOADAVG_TEMPLATE = "{load1:.2f} {load5:.2f} {load15:.2f} {running}/{total} {last_pid}\n"
+
+_CPUINFO_TEMPLATE = """processor\t: {index}
+vendor_id\t: {vendor}
+cpu family\t: 6
+model\t\t: 85
+model name\t: {model}
+stepping\t: 7
+microcode\t: 0x{microcode:x}
+cpu MHz\t\t: {mhz:.3f}
+cache size\t: {cache_kb} KB
+physical id\t: 0
+siblings\t: {cores}
+core id\t\t: {index}
+cpu cores\t: {cores}
+bogomips\t: {bogomips:.2f}
+flags\t\t: fpu vme de pse tsc msr pae mce cx8 apic sep mtrr pge mca cmov pat pse36 clflush mmx fxsr sse sse2 ss ht syscall nx pdpe1gb rdtscp lm constant_tsc arch_perfmon rep_good nopl xtopology
+
+"""
+
+_CACHE_SIZES_KB = (25344, 35840, 16384)
+
+
+def _random_units(n):
+    """
+    Draw n uniform floats in [0, 1) from a single RNG call.
+
+    One randbytes() draw replaces n separate random.uniform/randint calls
+    when rendering a file with many randomized fields.
+    """
+    return [v / 4294967296.0 for v in struct.unpack(f"<{n}I", random.randbytes(4 * n))]
+
+
+def _compile_ordered_union(patterns):
+    """
+    Fuse regex patterns into one compiled alternation.
+
+    Each pattern is wrapped in a lookahead followed by an empty named group
+    (p0, p1, ...), so a single match() reports the first pattern - in list
+    order - that occurs anywhere in the string, exactly like searching the
+    patterns one by one.
+    """
+    return re.compile(
+        "|".join(f"(?=[\\s\\S]*?(?:{p}))(?P<p{i}>)" for i, p in enumerate(patterns)),
+        re.IGNORECASE
+    )
+
+
+_REGEX_META = re.compile(r"[\\.^$*+?{}\[\]|()]")
+
+
+def _build_literal_automaton(patterns):
+    """
+    Build an Aho-Corasick automaton over the plain-substring patterns.
+
+    Returns (automaton, regex_indices, regex_union): the automaton maps each
+    casefolded literal to its index in ``patterns``, regex_indices lists the
+    patterns that still need the regex engine and regex_union is their
+    compiled ordered union. The automaton is None when pyahocorasick is not
+    installed.
+    """
+    if ahocorasick is None:
+        return None, (), None
+
+    automaton = ahocorasick.Automaton()
+    regex_indices = []
+    for i, p in enumerate(patterns):
+        if _REGEX_META.search(p):
+            regex_indices.append(i)
+        elif not automaton.exists(p.casefold()):
+            automaton.add_word(p.casefold(), i)  # Earliest pattern wins
+    automaton.make_automaton()
+    regex_union = _compile_ordered_union(patterns[i] for i in regex_indices) if regex_indices else None
+    return automaton, tuple(regex_indices), regex_union
+
+
 class AntiFingerprintManager:
     """
     Implements anti-fingerprinting techniques to make the deception more realistic.
@@ -31,15 +227,27 @@ class AntiFingerprintManager:
     5. File system structure analysis
     """
 
+    # Seconds a regenerated dynamic /proc file is reused for repeated reads
+    DYNAMIC_FILE_TTL = 1.0
+
     def __init__(self, config_dir="."):
         self.config_dir = config_dir
         self.proc_cache = {}
+        self._dyn_cache = {}  # path -> (generated_at, content)
+        self._encoded = dict(_STATIC_ENCODED)  # path -> (content, utf-8 bytes of content)
+        # Picked once so /etc/hostname and /etc/hosts agree
+        self._hostname = self._pick_hostname()
+        # Uptime is drawn once, then advances with the real clock
+        self._uptime_origin = None  # (monotonic_at_draw, uptime_secs, idle_ratio)
         self._init_proc_filesystem()
         self._init_system_files()
 
     def _init_proc_filesystem(self):
         """
-        Creates realistic /proc entries that attackers commonly check.
+        Registers realistic /proc entries that attackers commonly check.
+
+        Entries hold their generator until first read (see _lookup), so a
+        session only pays for the files the attacker actually opens.
 
         Attackers use commands like:
         - cat /proc/self/exe
@@ -56,14 +264,14 @@ class AntiFingerprintManager:
         ]
 
         self.proc_cache = {
-            "/proc/version": self._generate_proc_version(random.choice(kernel_versions)),
-            "/proc/cpuinfo": self._generate_cpuinfo(),
-            "/proc/meminfo": self._generate_meminfo(),
-            "/proc/uptime": self._generate_uptime(),
-            "/proc/loadavg": self._generate_loadavg(),
-            "/proc/mounts": self._generate_mounts(),
-            "/proc/cmdline": self._generate_cmdline(),
-            "/proc/filesystems": self._generate_filesystems(),
+            "/proc/version": lambda: self._generate_proc_version(random.choice(kernel_versions)),
+            "/proc/cpuinfo": self._generate_cpuinfo,
+            "/proc/meminfo": self._generate_meminfo,
+            "/proc/uptime": self._generate_uptime,
+            "/proc/loadavg": self._generate_loadavg,
+            "/proc/mounts": _PROC_MOUNTS,
+            "/proc/cmdline": self._generate_cmdline,
+            "/proc/filesystems": _PROC_FILESYSTEMS,
         }
 
     def _generate_proc_version(self, kernel_version):
@@ -88,131 +296,107 @@ class AntiFingerprintManager:
         model = random.choice(cpu_models)
         cores = random.choice([2, 4, 8, 16])
 
-        cpuinfo = ""
-        for i in range(cores):
-            cpuinfo += f"""processor\t: {i}
-vendor_id\t: {'GenuineIntel' if 'Intel' in model else 'AuthenticAMD'}
-cpu family\t: 6
-model\t\t: 85
-model name\t: {model}
-stepping\t: 7
-microcode\t: 0x{random.randint(0x5000, 0x5fff):x}
-cpu MHz\t\t: {random.uniform(2000, 3500):.3f}
-cache size\t: {random.choice([25344, 35840, 16384])} KB
-physical id\t: 0
-siblings\t: {cores}
-core id\t\t: {i}
-cpu cores\t: {cores}
-bogomips\t: {random.uniform(4000, 6000):.2f}
-flags\t\t: fpu vme de pse tsc msr pae mce cx8 apic sep mtrr pge mca cmov pat pse36 clflush mmx fxsr sse sse2 ss ht syscall nx pdpe1gb rdtscp lm constant_tsc arch_perfmon rep_good nopl xtopology
+        vendor = 'GenuineIntel' if 'Intel' in model else 'AuthenticAMD'
 
-"""
-        return cpuinfo
+        # Four randomized fields per core, drawn in one batch
+        units = _random_units(4 * cores)
+
+        parts = [None] * cores
+        for i in range(cores):
+            u_code, u_mhz, u_cache, u_bogo = units[4 * i:4 * i + 4]
+            parts[i] = _CPUINFO_TEMPLATE.format(
+                index=i,
+                vendor=vendor,
+                model=model,
+                microcode=0x5000 + int(u_code * 0x1000),
+                mhz=2000 + u_mhz * 1500,
+                cache_kb=_CACHE_SIZES_KB[int(u_cache * len(_CACHE_SIZES_KB))],
+                cores=cores,
+                bogomips=4000 + u_bogo * 2000,
+            )
+        return "".join(parts)
 
     def _generate_meminfo(self):
         """Generate realistic /proc/meminfo content."""
-        total_gb = random.choice([4, 8, 16, 32, 64])
-        total_kb = total_gb * 1024 * 1024
+        return _MEMINFO_TEMPLATE.format_map(self._meminfo_draw())
 
-        # Realistic memory distribution
-        free_pct = random.uniform(0.15, 0.45)
-        buffers_pct = random.uniform(0.02, 0.08)
-        cached_pct = random.uniform(0.20, 0.40)
+    def _meminfo_draw(self):
+        """Draw the field values substituted into the /proc/meminfo template."""
+        total_kb = random.choice([4, 8, 16, 32, 64]) * 1024 * 1024
+        u = _random_units(8)
 
-        free_kb = int(total_kb * free_pct)
-        buffers_kb = int(total_kb * buffers_pct)
-        cached_kb = int(total_kb * cached_pct)
-        available_kb = free_kb + buffers_kb + int(cached_kb * 0.8)
+        # Realistic memory distribution
+        free_kb = int(total_kb * (0.15 + u[0] * 0.30))
+        buffers_kb = int(total_kb * (0.02 + u[1] * 0.06))
+        cached_kb = int(total_kb * (0.20 + u[2] * 0.20))
 
-        return f"""MemTotal:       {total_kb} kB
-MemFree:        {free_kb} kB
-MemAvailable:   {available_kb} kB
-Buffers:        {buffers_kb} kB
-Cached:         {cached_kb} kB
-SwapCached:     {random.randint(0, 50000)} kB
-Active:         {int(total_kb * 0.35)} kB
-Inactive:       {int(total_kb * 0.25)} kB
-SwapTotal:      {total_kb // 2} kB
-SwapFree:       {total_kb // 2 - random.randint(0, 100000)} kB
-Dirty:          {random.randint(0, 1000)} kB
-Writeback:      0 kB
-AnonPages:      {int(total_kb * 0.20)} kB
-Mapped:         {random.randint(50000, 200000)} kB
-Shmem:          {random.randint(10000, 100000)} kB
-"""
+        return {
+            "total_kb": total_kb,
+            "free_kb": free_kb,
+            "available_kb": free_kb + buffers_kb + int(cached_kb * 0.8),
+            "buffers_kb": buffers_kb,
+            "cached_kb": cached_kb,
+            "swap_cached_kb": int(u[3] * 50001),
+            "active_kb": int(total_kb * 0.35),
+            "inactive_kb": int(total_kb * 0.25),
+            "swap_total_kb": total_kb // 2,
+            "swap_free_kb": total_kb // 2 - int(u[4] * 100001),
+            "dirty_kb": int(u[5] * 1001),
+            "anon_kb": int(total_kb * 0.20),
+            "mapped_kb": 50000 + int(u[6] * 150001),
+            "shmem_kb": 10000 + int(u[7] * 90001),
+        }
 
     def _generate_uptime(self):
-        """Generate realistic /proc/uptime content."""
-        # System uptime in seconds (1-90 days)
-        uptime_secs = random.randint(86400, 86400 * 90)
-        idle_secs = uptime_secs * random.uniform(0.85, 0.98)
-        return f"{uptime_secs:.2f} {idle_secs:.2f}\n"
+        """Generate realistic /proc/uptime content (monotonic across reads)."""
+        if self._uptime_origin is None:
+            # System uptime in seconds (1-90 days)
+            u_up, u_idle = _random_units(2)
+            self._uptime_origin = (
+                time.monotonic(),
+                86400 + int(u_up * (86400 * 89 + 1)),
+                0.85 + u_idle * 0.13,
+            )
+
+        drawn_at, base_secs, idle_ratio = self._uptime_origin
+        uptime_secs = base_secs + (time.monotonic() - drawn_at)
+        return _UPTIME_TEMPLATE.format(uptime=uptime_secs, idle=uptime_secs * idle_ratio)
 
     def _generate_loadavg(self):
         """Generate realistic /proc/loadavg content."""
-        load1 = random.uniform(0.01, 2.5)
-        load5 = load1 * random.uniform(0.8, 1.2)
-        load15 = load5 * random.uniform(0.8, 1.1)
-        running = random.randint(1, 5)
-        total = random.randint(150, 400)
-        last_pid = random.randint(10000, 99999)
-        return f"{load1:.2f} {load5:.2f} {load15:.2f} {running}/{total} {last_pid}\n"
+        u = _random_units(6)
+        load1 = 0.01 + u[0] * 2.49
+        load5 = load1 * (0.8 + u[1] * 0.4)
+        load15 = load5 * (0.8 + u[2] * 0.3)
+        running = 1 + int(u[3] * 5)
+        total = 150 + int(u[4] * 251)
+        last_pid = 10000 + int(u[5] * 90000)
+        return _LOADAVG_TEMPLATE.format(
+            load1=load1, load5=load5, load15=load15,
+            running=running, total=total, last_pid=last_pid
+        )
 
     def _generate_mounts(self):
         """Generate realistic /proc/mounts content (avoiding UML honeypot signatures)."""
-        # NOTE: UML honeypots have distinct /proc/mounts signatures - we avoid those
-        return """/dev/sda1 / ext4 rw,relatime,errors=remount-ro 0 0
-devtmpfs /dev devtmpfs rw,nosuid,size=4096k,nr_inodes=1048576,mode=755,inode64 0 0
-proc /proc proc rw,nosuid,nodev,noexec,relatime 0 0
-sysfs /sys sysfs rw,nosuid,nodev,noexec,relatime 0 0
-tmpfs /run tmpfs rw,nosuid,nodev,size=1630744k,nr_inodes=819200,mode=755,inode64 0 0
-tmpfs /dev/shm tmpfs rw,nosuid,nodev,inode64 0 0
-tmpfs /run/lock tmpfs rw,nosuid,nodev,noexec,relatime,size=5120k,inode64 0 0
-cgroup2 /sys/fs/cgroup cgroup2 rw,nosuid,nodev,noexec,relatime,nsdelegate,memory_recursiveprot 0 0
-"""
+        return _PROC_MOUNTS
 
     def _generate_cmdline(self):
         """Generate realistic /proc/cmdline content (avoiding UML signatures)."""
         # NOTE: UML honeypots have "uml" in cmdline - we avoid that
-        root_uuid = hashlib.md5(str(random.random()).encode()).hexdigest()[:8]
+        root_uuid = secrets.token_hex(4)
         return f"BOOT_IMAGE=/vmlinuz-5.15.0-91-generic root=UUID={root_uuid}-{root_uuid[:4]}-{root_uuid[4:8]}-{root_uuid[:4]}-{root_uuid}{root_uuid[:4]} ro quiet splash\n"
 
     def _generate_filesystems(self):
         """Generate realistic /proc/filesystems content."""
-        return """nodev\tsysfs
-nodev\ttmpfs
-nodev\tbdev
-nodev\tproc
-nodev\tcgroup
-nodev\tcgroup2
-nodev\tcpuset
-nodev\tdevtmpfs
-nodev\tdevpts
-nodev\tsecurityfs
-nodev\tsockfs
-nodev\tdebugfs
-nodev\ttracefs
-nodev\thugetlbfs
-nodev\tmqueue
-nodev\tpstore
-nodev\tautofs
-\text3
-\text4
-\text2
-\tvfat
-\tfuseblk
-nodev\tfuse
-nodev\tfusectl
-nodev\tefivarfs
-"""
+        return _PROC_FILESYSTEMS
 
     def _init_system_files(self):
-        """Initialize other system files that attackers might check."""
+        """Register other system files that attackers might check (lazily)."""
         self.system_files = {
-            "/etc/os-release": self._generate_os_release(),
-            "/etc/passwd": self._generate_passwd(),
-            "/etc/hostname": self._generate_hostname(),
-            "/etc/hosts": self._generate_hosts(),
+            "/etc/os-release": self._generate_os_release,
+            "/etc/passwd": _ETC_PASSWD,
+            "/etc/hostname": lambda: self._hostname + "\n",
+            "/etc/hosts": self._generate_hosts,
         }
 
     def _generate_os_release(self):
@@ -242,72 +426,82 @@ UBUNTU_CODENAME={codename.lower().replace(' ', '')}
 
     def _generate_passwd(self):
         """Generate realistic /etc/passwd with our fake personas."""
-        base_passwd = """root:x:0:0:root:/root:/bin/bash
-daemon:x:1:1:daemon:/usr/sbin:/usr/sbin/nologin
-bin:x:2:2:bin:/bin:/usr/sbin/nologin
-sys:x:3:3:sys:/dev:/usr/sbin/nologin
-sync:x:4:65534:sync:/bin:/bin/sync
-games:x:5:60:games:/usr/games:/usr/sbin/nologin
-man:x:6:12:man:/var/cache/man:/usr/sbin/nologin
-lp:x:7:7:lp:/var/spool/lpd:/usr/sbin/nologin
-mail:x:8:8:mail:/var/mail:/usr/sbin/nologin
-news:x:9:9:news:/var/spool/news:/usr/sbin/nologin
-uucp:x:10:10:uucp:/var/spool/uucp:/usr/sbin/nologin
-proxy:x:13:13:proxy:/bin:/usr/sbin/nologin
-www-data:x:33:33:www-data:/var/www:/usr/sbin/nologin
-backup:x:34:34:backup:/var/backups:/usr/sbin/nologin
-list:x:38:38:Mailing List Manager:/var/list:/usr/sbin/nologin
-irc:x:39:39:ircd:/run/ircd:/usr/sbin/nologin
-nobody:x:65534:65534:nobody:/nonexistent:/usr/sbin/nologin
-systemd-network:x:100:102:systemd Network Management,,,:/run/systemd:/usr/sbin/nologin
-systemd-resolve:x:101:103:systemd Resolver,,,:/run/systemd:/usr/sbin/nologin
-syslog:x:102:106::/home/syslog:/usr/sbin/nologin
-messagebus:x:103:107::/nonexistent:/usr/sbin/nologin
-_apt:x:104:65534::/nonexistent:/usr/sbin/nologin
-sshd:x:105:65534::/run/sshd:/usr/sbin/nologin
-dev_alice:x:1000:1000:Alice Developer,,,:/home/dev_alice:/bin/bash
-sys_bob:x:1001:1001:Bob SysAdmin,,,:/home/sys_bob:/bin/bash
-jenkins:x:1002:1002:Jenkins CI,,,:/var/lib/jenkins:/bin/bash
-"""
-        return base_passwd
+        return _ETC_PASSWD
 
-    def _generate_hostname(self):
-        """Generate a realistic hostname."""
+    def _pick_hostname(self):
+        """Pick a realistic hostname (without trailing newline)."""
         prefixes = ["srv", "web", "app", "db", "dev", "prod", "staging"]
         suffixes = ["01", "02", "03", "a", "b", "primary", "secondary"]
         domains = ["internal", "local", "corp"]
 
-        return f"{random.choice(prefixes)}-{random.choice(suffixes)}.{random.choice(domains)}\n"
+        return f"{random.choice(prefixes)}-{random.choice(suffixes)}.{random.choice(domains)}"
 
     def _generate_hosts(self):
         """Generate realistic /etc/hosts content."""
-        hostname = self._generate_hostname().strip()
-        return f"""127.0.0.1\tlocalhost
-127.0.1.1\t{hostname}
-
-# The following lines are desirable for IPv6 capable hosts
-::1     ip6-localhost ip6-loopback
-fe00::0 ip6-localnet
-ff00::0 ip6-mcastprefix
-ff02::1 ip6-allnodes
-ff02::2 ip6-allrouters
-"""
+        return _ETC_HOSTS_TEMPLATE.format(hostname=self._hostname)
 
     def get_proc_file(self, path):
         """Get content for a /proc file."""
-        # Regenerate dynamic files each time
+        # Regenerate dynamic files on read
         if path == "/proc/uptime":
             return self._generate_uptime()
         elif path == "/proc/loadavg":
-            return self._generate_loadavg()
+            return self._get_dynamic(path, self._generate_loadavg)
         elif path == "/proc/meminfo":
-            return self._generate_meminfo()
+            return self._get_dynamic(path, self._generate_meminfo)
+
+        return self._lookup(self.proc_cache, path)
 
-        return self.proc_cache.get(path)
+    def get_proc_file_bytes(self, path):
+        """Get content for a /proc file as UTF-8 bytes, ready to send."""
+        return self._encode(path, self.get_proc_file(path))
+
+    def _lookup(self, cache, path):
+        """Return a cached file, generating and storing it on first access."""
+        content = cache.get(path)
+        if callable(content):
+            content = cache[path] = content()
+        return content
+
+    def _get_dynamic(self, path, generator):
+        """
+        Return a regenerated file, reusing it for DYNAMIC_FILE_TTL seconds.
+
+        Enumeration scripts often read the same file several times in a
+        burst; those reads share one draw, as they would on a real host.
+        """
+        now = time.monotonic()
+        entry = self._dyn_cache.get(path)
+        if entry and now - entry[0] < self.DYNAMIC_FILE_TTL:
+            return entry[1]
+
+        content = generator()
+        self._dyn_cache[path] = (now, content)
+        return content
 
     def get_system_file(self, path):
         """Get content for a system file."""
-        return self.system_files.get(path)
+        return self._lookup(self.system_files, path)
+
+    def get_system_file_bytes(self, path):
+        """Get content for a system file as UTF-8 bytes, ready to send."""
+        return self._encode(path, self.get_system_file(path))
+
+    def _encode(self, path, content):
+        """
+        Encode file content, reusing the bytes while the content is unchanged.
+
+        Static files and TTL-cached dynamic files hand back the same str
+        object on every read, so they are encoded only once.
+        """
+        if content is None:
+            return None
+        entry = self._encoded.get(path)
+        if entry is not None and entry[0] is content:
+            return entry[1]
+        data = content.encode("utf-8")
+        self._encoded[path] = (content, data)
+        return data
 
 
 class RealisticTimestampManager:
@@ -320,14 +514,17 @@ class RealisticTimestampManager:
     3. Command timing follows natural rhythms
     """
 
+    __slots__ = ("_start_hour", "_end_hour", "base_time", "last_command_time")
+
     def __init__(self, persona_data):
-        self.work_hours = persona_data.get('work_hours', [9, 17])
-        self.base_time = datetime.now()
+        self._start_hour, self._end_hour = persona_data.get('work_hours', [9, 17])
+        # Timestamps are kept as integer unix seconds, the form bash writes
+        self.base_time = int(time.time())
         self.last_command_time = None
 
     def get_next_timestamp(self, command_type="normal"):
         """
-        Generate a realistic timestamp for the next command.
+        Generate a realistic timestamp (unix seconds) for the next command.
 
         Command types:
         - normal: Regular command (1-30 second gap)
@@ -354,49 +551,47 @@ class RealisticTimestampManager:
         else:
             gap = random.uniform(1, 30)
 
-        self.last_command_time += timedelta(seconds=gap)
+        ts = self.last_command_time + int(gap)
+        start_hour = self._start_hour
+        end_hour = self._end_hour
+        hour = time.localtime(ts).tm_hour
 
-        # Ensure we're in work hours
-        while not self._is_work_hours(self.last_command_time):
-            # Skip to next work day
-            self.last_command_time += timedelta(hours=1)
+        # Ensure we're in work hours: jump to the next work-hours start,
+        # keeping the minutes (same result as stepping an hour at a time)
+        # Weekends could be skipped here too via tm_wday >= 5
+        if not start_hour <= hour < end_hour:
+            if hour >= end_hour:
+                # Skip to next work day
+                ts += 86400
+            ts += (start_hour - hour) * 3600
 
-        return self.last_command_time
+        self.last_command_time = ts
+        return ts
 
     def _get_work_time(self):
         """Get a timestamp within work hours."""
-        now = datetime.now()
-        start_hour, end_hour = self.work_hours
+        now = int(time.time())
+        tm = time.localtime(now)
+        start_hour = self._start_hour
+        end_hour = self._end_hour
 
-        if start_hour <= now.hour < end_hour:
+        if start_hour <= tm.tm_hour < end_hour:
             return now
 
-        # Move to next work period
-        if now.hour >= end_hour:
+        # Move to next work period, at a random minute past the hour
+        ts = now + (start_hour - tm.tm_hour) * 3600 + (random.randint(0, 30) - tm.tm_min) * 60
+        if tm.tm_hour >= end_hour:
             # Next day
-            next_day = now + timedelta(days=1)
-            return next_day.replace(hour=start_hour, minute=random.randint(0, 30))
-        else:
-            # Later today
-            return now.replace(hour=start_hour, minute=random.randint(0, 30))
-
-    def _is_work_hours(self, dt):
-        """Check if datetime is within work hours."""
-        start_hour, end_hour = self.work_hours
-
-        # Skip weekends (optional - can be configured)
-        # if dt.weekday() >= 5:
-        #     return False
-
-        return start_hour <= dt.hour < end_hour
+            ts += 86400
+        return ts
 
     def format_for_history(self, timestamp):
         """Format timestamp for bash history (HISTTIMEFORMAT style)."""
-        return timestamp.strftime("#%s")  # Unix epoch format
+        return f"#{timestamp}"  # Unix epoch format
 
     def format_human_readable(self, timestamp):
         """Format timestamp for human-readable display."""
-        return timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
 
 
 class BashHistoryManager:
@@ -410,7 +605,13 @@ class BashHistoryManager:
     - Command frequency analysis
     """
 
-    COMMON_TYPOS = {
+    __slots__ = (
+        "username", "home_dir", "history_file",
+        "timestamp_manager", "history_buffer", "_history_dir_ready",
+    )
+
+    # Interned keys, shared by every per-persona manager
+    COMMON_TYPOS = {sys.intern(cmd): typos for cmd, typos in {
         "git": ["gti", "got", "gir"],
         "docker": ["dockr", "docekr", "dokcer"],
         "kubectl": ["kubetcl", "kubctl", "kuberctl"],
@@ -421,7 +622,7 @@ class BashHistoryManager:
         "cat": ["cta", "act"],
         "grep": ["gerp", "gre"],
         "vim": ["vom", "vmi", "cim"],
-    }
+    }.items()}
 
     # Commands that typically follow each other
     COMMAND_SEQUENCES = [
@@ -433,12 +634,16 @@ class BashHistoryManager:
         ["make", "make test", "make install"],
     ]
 
+    # Bytes read per backwards step in get_recent_commands
+    TAIL_BLOCK_SIZE = 8192
+
     def __init__(self, username, home_dir, persona_data):
         self.username = username
         self.home_dir = home_dir
         self.history_file = os.path.join(home_dir, ".bash_history")
         self.timestamp_manager = RealisticTimestampManager(persona_data)
         self.history_buffer = []
+        self._history_dir_ready = False
 
     def add_command(self, command, add_typo_chance=0.05):
         """
@@ -475,15 +680,25 @@ class BashHistoryManager:
         return command
 
     def flush_to_file(self):
-        """Write buffered history to file with timestamps."""
+        """Write buffered history to file with timestamps (single append)."""
         try:
-            os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
-
-            with open(self.history_file, "a") as f:
-                for timestamp, command in self.history_buffer:
-                    # Write timestamp line (HISTTIMEFORMAT format)
-                    f.write(f"#{int(timestamp.timestamp())}\n")
-                    f.write(f"{command}\n")
+            if not self._history_dir_ready:
+                os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+                self._history_dir_ready = True
+
+            # Timestamp line (HISTTIMEFORMAT format) followed by the command
+            payload = "".join(
+                f"#{timestamp}\n{command}\n"
+                for timestamp, command in self.history_buffer
+            ).encode("utf-8")
+
+            fd = os.open(self.history_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+            try:
+                view = memoryview(payload)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
 
             self.history_buffer.clear()
             logger.debug(f"Flushed history to {self.history_file}")
@@ -492,15 +707,36 @@ class BashHistoryManager:
             logger.error(f"Failed to write history: {e}")
 
     def get_recent_commands(self, count=10):
-        """Get recent commands from history."""
+        """
+        Get recent commands from history.
+
+        Reads the file backwards in fixed-size blocks and stops once enough
+        command lines are collected, so the cost does not grow with the
+        length of the history.
+        """
         try:
             if os.path.exists(self.history_file):
-                with open(self.history_file, "r") as f:
-                    lines = f.readlines()
-
-                # Filter out timestamp lines
-                commands = [l.strip() for l in lines if not l.startswith("#")]
-                return commands[-count:]
+                with open(self.history_file, "rb") as f:
+                    f.seek(0, os.SEEK_END)
+                    pos = f.tell()
+                    tail = b""
+                    commands = []
+                    while pos > 0:
+                        step = min(self.TAIL_BLOCK_SIZE, pos)
+                        pos -= step
+                        f.seek(pos)
+                        tail = f.read(step) + tail
+                        lines = tail.split(b"\n")
+                        # The first line may be cut mid-way unless we reached the start
+                        complete = lines if pos == 0 else lines[1:]
+                        # Filter out timestamp lines
+                        commands = [l for l in complete if not l.startswith(b"#")]
+                        if len(commands) > count:
+                            break
+
+                if commands and not commands[-1]:
+                    commands.pop()  # trailing newline
+                return [c.decode("utf-8", "replace").strip() for c in commands[-count:]]
         except:
             pass
         return []
@@ -540,14 +776,31 @@ class AttackerBehaviorDetector:
         (r"ps aux", "process_enum", "low"),
     ]
 
+    # Compiled once for all detectors: one regex call per analyzed command
+    _FINGERPRINT_RE = _compile_ordered_union(p for p, _, _ in FINGERPRINT_PATTERNS)
+    _FINGERPRINT_META = tuple((name, severity) for _, name, severity in FINGERPRINT_PATTERNS)
+
+    # With pyahocorasick, literal patterns are found in one pass and only the
+    # true regexes go through re; otherwise _FINGERPRINT_RE handles them all
+    _LITERAL_AUTOMATON, _REGEX_INDICES, _REGEX_ONLY_RE = _build_literal_automaton(
+        [p for p, _, _ in FINGERPRINT_PATTERNS]
+    )
+
+    SEVERITY_SCORES = {"low": 1, "medium": 3, "high": 5, "critical": 10}
+
+    # Minimum score for each threat level, ascending (bisect lookup)
+    _LEVEL_THRESHOLDS = (0, 1, 5, 10, 20)
+    _LEVEL_NAMES = ("none", "low", "medium", "high", "critical")
+
+    # Only the tail of the log is ever reported; cap it so long-running
+    # honeypots don't accumulate detections without bound
+    DETECTION_LOG_SIZE = 1024
+
     def __init__(self):
-        self.detection_log = []
+        self.detection_log = deque(maxlen=self.DETECTION_LOG_SIZE)
+        self.detection_count = 0
         self.threat_score = 0
-        import re
-        self.compiled_patterns = [
-            (re.compile(p, re.IGNORECASE), name, severity)
-            for p, name, severity in self.FINGERPRINT_PATTERNS
-        ]
+        self._ts_cache = (0, "")  # (unix second, formatted timestamp)
 
     def analyze_command(self, command):
         """
@@ -556,38 +809,58 @@ class AttackerBehaviorDetector:
         Returns:
             dict: Detection result with threat info
         """
-        for pattern, name, severity in self.compiled_patterns:
-            if pattern.search(command):
-                detection = {
-                    "command": command,
-                    "pattern": name,
-                    "severity": severity,
-                    "timestamp": datetime.now().isoformat()
-                }
-                self.detection_log.append(detection)
-                self._update_threat_score(severity)
-
-                logger.warning(f"[FINGERPRINT DETECTED] {name}: {command}")
-                return detection
-
-        return None
+        index = self._match_pattern(command)
+        if index is None:
+            return None
+
+        name, severity = self._FINGERPRINT_META[index]
+        detection = {
+            "command": command,
+            "pattern": name,
+            "severity": severity,
+            "timestamp": self._timestamp()
+        }
+        self.detection_log.append(detection)
+        self.detection_count += 1
+        self._update_threat_score(severity)
+
+        logger.warning(f"[FINGERPRINT DETECTED] {name}: {command}")
+        return detection
+
+    def _timestamp(self):
+        """ISO-8601 local time to the second, formatted once per second."""
+        sec = int(time.time())
+        if sec != self._ts_cache[0]:
+            self._ts_cache = (sec, time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec)))
+        return self._ts_cache[1]
+
+    def _match_pattern(self, command):
+        """
+        Return the index of the first pattern (in list order) found in the
+        command, or None.
+        """
+        if self._LITERAL_AUTOMATON is None:
+            match = self._FINGERPRINT_RE.match(command)
+            return int(match.lastgroup[1:]) if match else None
+
+        best = min((i for _, i in self._LITERAL_AUTOMATON.iter(command.casefold())), default=None)
+
+        # A regex pattern only wins if it is listed before the best literal
+        if self._REGEX_ONLY_RE is not None and (best is None or best > self._REGEX_INDICES[0]):
+            match = self._REGEX_ONLY_RE.match(command)
+            if match:
+                index = self._REGEX_INDICES[int(match.lastgroup[1:])]
+                if best is None or index < best:
+                    return index
+        return best
 
     def _update_threat_score(self, severity):
         """Update cumulative threat score."""
-        scores = {"low": 1, "medium": 3, "high": 5, "critical": 10}
-        self.threat_score += scores.get(severity, 1)
+        self.threat_score += self.SEVERITY_SCORES.get(severity, 1)
 
     def get_threat_level(self):
         """Get current threat level based on accumulated score."""
-        if self.threat_score >= 20:
-            return "critical"
-        elif self.threat_score >= 10:
-            return "high"
-        elif self.threat_score >= 5:
-            return "medium"
-        elif self.threat_score > 0:
-            return "low"
-        return "none"
+        return self._LEVEL_NAMES[bisect_right(self._LEVEL_THRESHOLDS, self.threat_score) - 1]
 
     def should_adapt_behavior(self):
         """Determine if we should change deception strategy."""
@@ -596,8 +869,8 @@ class AttackerBehaviorDetector:
     def get_detection_summary(self):
         """Get summary of all detections."""
         return {
-            "total_detections": len(self.detection_log),
+            "total_detections": self.detection_count,
             "threat_score": self.threat_score,
             "threat_level": self.get_threat_level(),
-            "recent_detections": self.detection_log[-10:]
+            "recent_detections": list(islice(self.detection_log, max(0, len(self.detection_log) - 10), None))
         }
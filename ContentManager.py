@@ -1,11 +1,154 @@
+import atexit
+import copy
+import functools
 import json
 import os
 import random
+import re
 import logging
+import mmap
+import subprocess
+import tempfile
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import orjson  # Optional: faster (de)serialization of the JSON stores
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Cache sections consumed from the front; held as deques in memory
+_QUEUE_KEYS = ("forecast_queue", "breadcrumbs")
+
+# Top-level cache keys; each is stored in its own file so a mutation only
+# rewrites its section
+_SECTIONS = ("forecast_queue", "assets", "personas", "breadcrumbs")
+
+
+def _json_default(obj):
+    if isinstance(obj, deque):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# Stores are machine-read; CONTENT_DEBUG=1 pretty-prints them for humans
+_PRETTY_JSON = os.getenv("CONTENT_DEBUG") == "1"
+
+
+def _dumps(obj):
+    """Serializes obj to compact JSON bytes (orjson if available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default,
+                            option=orjson.OPT_INDENT_2 if _PRETTY_JSON else 0)
+    if _PRETTY_JSON:
+        return json.dumps(obj, indent=4, default=_json_default).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+def _loads(data):
+    """Parses JSON from bytes (orjson if available)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _git_user_section(user):
+    """[user] block for .git/config, same as `git config user.email/user.name`."""
+    name = user.replace("\\", "\\\\").replace('"', '\\"')
+    return f'[user]\n\temail = "{name}@company.com"\n\tname = "{name}"\n'
+
+
+@functools.lru_cache(maxsize=32)
+def _read_json_cached(path, mtime_ns):
+    """Parses a JSON file; mtime_ns is part of the key so edits on disk invalidate it."""
+    with open(path, 'rb') as f:
+        return _loads(f.read())
+
+
+def _load_json_file(path):
+    """
+    Loads a JSON config file through the parse cache.
+    Returns None if the file does not exist. The result is a private deep
+    copy, so callers may mutate it without touching the cached parse.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return copy.deepcopy(_read_json_cached(path, mtime_ns))
+
+
+# Store files at least this large are parsed straight from an mmap (orjson only)
+_MMAP_MIN_BYTES = 1 << 20
+
+
+def _load_file(f):
+    """Parses an open binary JSON file, avoiding a full read() copy when large."""
+    if orjson is not None and os.fstat(f.fileno()).st_size >= _MMAP_MIN_BYTES:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+    return _loads(f.read())
+
+
+def _read_json_with_backup(path):
+    """
+    Loads path, falling back to path + '.bak' if it is missing or corrupt.
+    Returns None when neither is usable.
+    """
+    for candidate in (path, path + ".bak"):
+        try:
+            with open(candidate, 'rb') as f:
+                data = _load_file(f)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            logger.warning(f"Ignoring corrupt cache file {candidate}: {e}")
+            continue
+        if candidate != path:
+            logger.warning(f"Recovered {path} from backup")
+        return data
+    return None
+
+
+def _atomic_write(path, data, sync=True, backup=False):
+    """
+    Replaces path with data via a sibling temp file and os.replace, so a
+    crash mid-write never leaves a truncated file behind. With sync=False
+    the fsync is skipped (still atomic, but not durable across power loss).
+    With backup=True the previous file is kept as path + '.bak'.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        try:
+            if hasattr(os, "fchmod"):  # Not on Windows dev boxes
+                os.fchmod(fd, 0o644)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            if sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        if backup:
+            try:
+                os.replace(path, path + ".bak")
+            except FileNotFoundError:
+                pass
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
 class ContentManager:
     """
     Central repository for dynamic deception assets.
@@ -13,20 +156,100 @@ class ContentManager:
     1. Forecast Queue (Batch generated scenes)
     2. Asset Cache (Vulnerabilities, Honeytokens)
     """
+    # Queue pops are persisted as consumed-counts in a small cursor file;
+    # past this many the queue's section is marked dirty and rewritten (compacted)
+    CURSOR_COMPACT_AFTER = 32
+
     def __init__(self, llm_provider, cache_file="content_cache.json"):
         self.llm = llm_provider
         self.config_dir = os.getenv("CONFIG_DIR", ".")
         self.cache_file = os.path.join(self.config_dir, cache_file)
+        cache_base = os.path.splitext(self.cache_file)[0]
+        self.cache_file_cursors = cache_base + "_cursors.json"
+        self._section_files = {section: f"{cache_base}_{section}.json" for section in _SECTIONS}
+        # Store paths, joined once
+        self._paths = {
+            name: os.path.join(self.config_dir, f"{name}.json")
+            for name in ("triggers", "templates", "config")
+        }
         self.cache = self._load_cache()
-        self.config = {} # Init before load
+        self._load_cursors()
+        # Cheap mutations (persona seeding, compaction) only mark their section
+        # dirty; it is written by the background flusher, flush(), at the end
+        # of a batch() and at exit. _lock guards cache mutation against the flusher.
+        self._lock = threading.RLock()
+        self._stop_flush = threading.Event()
+        atexit.register(self._final_flush)
+        # CONTENT_NO_SYNC=1 skips fsync on every store write (bulk runs)
+        self.no_sync = os.getenv("CONTENT_NO_SYNC") == "1"
+        # triggers/templates/config and project_state are read on first access
+        self._triggers = None
+        self._templates = None
+        self._config = None
+        self._project_state = None
+        self._git_ready = False
         self.project_state_file = os.path.join(self.config_dir, "project_state.json")
-        self.load_dynamic_files()
-        self.load_project_state()
-        self._ensure_git_environment()
+        self.default_spec_file = os.path.join(self.config_dir, "worker-spec.json")
+        self._personas_cached = None
+        self._trigger_re = None
+        # Asset/template picks walk a shuffled permutation per pool
+        self._rng = random.Random()
+        self._pick_cursors = {} # pool key -> [items, order, next index]
+        self._trigger_re_src = None # triggers list _trigger_re was built from
+
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+
+    @property
+    def triggers(self):
+        if self._triggers is None:
+            self._load_triggers()
+        return self._triggers
+
+    @triggers.setter
+    def triggers(self, value):
+        self._triggers = value
+
+    @property
+    def templates(self):
+        if self._templates is None:
+            self._load_templates()
+        return self._templates
+
+    @templates.setter
+    def templates(self, value):
+        self._templates = value
+
+    @property
+    def config(self):
+        if self._config is None:
+            self._config = _load_json_file(self._paths["config"]) or {}
+        return self._config
+
+    @config.setter
+    def config(self, value):
+        self._config = value
+
+    @property
+    def project_state(self):
+        if self._project_state is None:
+            self.load_project_state()
+        return self._project_state
+
+    @project_state.setter
+    def project_state(self, value):
+        self._project_state = value
+
+    def ensure_git_environment(self):
+        """Sets up the persona git repos once, before the first scene needs them."""
+        if not self._git_ready:
+            self._git_ready = True
+            self._ensure_git_environment()
 
     def _ensure_git_environment(self):
         """Creates dummy git repositories for personas to avoid 'not a git repo' errors."""
-        personas = self.load_personas(os.path.join(self.config_dir, "worker-spec.json"))
+        personas = self.load_personas()
+        work = []
         for user, data in personas.items():
             # Heuristic: If they are a dev, give them a repo
             if "dev" in user or "skills" in data and "git" in data["skills"]:
@@ -39,56 +262,169 @@ class ContentManager:
                 # Since we are operating on the REAL file system (or fake one depending on implementation),
                 # we should try to physically create these folders if we can.
                 # NOTE: This runs as the service user (root).
-                if not os.path.exists(base_repo_dir):
-                    try:
-                        os.makedirs(base_repo_dir)
-                    except:
-                        pass # Permission issues or non-existent parent
-
                 for repo in common_repos:
-                    repo_path = os.path.join(base_repo_dir, repo)
-                    if not os.path.exists(repo_path):
-                        try:
-                            os.makedirs(repo_path)
-                            # Init git
-                            import subprocess
-                            subprocess.run(["git", "init"], cwd=repo_path, capture_output=True)
-                            subprocess.run(["git", "config", "user.email", f"{user}@company.com"], cwd=repo_path, capture_output=True)
-                            subprocess.run(["git", "config", "user.name", user], cwd=repo_path, capture_output=True)
-                            logger.info(f"Initialized fake git repo at {repo_path}")
-                        except Exception as e:
-                            logger.warning(f"Failed to init git repo {repo_path}: {e}")
+                    work.append((os.path.join(base_repo_dir, repo), user))
+
+        if work:
+            # Repos are independent and git init is mostly fork/IO wait
+            with ThreadPoolExecutor(max_workers=8) as ex:
+                list(ex.map(self._init_one_repo, work))
+
+    def _init_one_repo(self, item):
+        repo_path, user = item
+        try:
+            # Creates repos/ too; an existing repo is left untouched
+            os.makedirs(repo_path)
+        except FileExistsError:
+            return
+        except Exception as e:
+            logger.warning(f"Failed to init git repo {repo_path}: {e}")
+            return
+        try:
+            # Init git: one fork, identity appended straight to .git/config
+            subprocess.run(["git", "init"], cwd=repo_path,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with open(os.path.join(repo_path, ".git", "config"), "a") as f:
+                f.write(_git_user_section(user))
+            logger.info(f"Initialized fake git repo at {repo_path}")
+        except Exception as e:
+            logger.warning(f"Failed to init git repo {repo_path}: {e}")
 
     def _load_cache(self):
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r') as f:
-                    return json.load(f)
-            except:
+        """
+        Loads each cache section from its own file. Falls back to the legacy
+        single-file cache (migrated on the next flush) if no section exists.
+        """
+        self._epochs = dict.fromkeys(_QUEUE_KEYS, 0)
+        self._dirty_sections = set()
+        cache = {}
+        for section in _SECTIONS:
+            data = _read_json_with_backup(self._section_files[section])
+            if data is None:
+                continue
+            if section in _QUEUE_KEYS:
+                # Queue files carry the epoch their cursors refer to
+                self._epochs[section] = data.get("epoch", 0)
+                data = data.get("items", [])
+            cache[section] = data
+
+        if not cache:
+            cache = _read_json_with_backup(self.cache_file)
+            if cache is None:
                 return self._init_empty_cache()
-        return self._init_empty_cache()
+            self._dirty_sections.update(s for s in _SECTIONS if s in cache)
+
+        # Only dirty sections are ever written, so some may have no file yet
+        cache = {**self._init_empty_cache(), **cache}
+        for key in _QUEUE_KEYS:
+            if key in cache:
+                cache[key] = deque(cache[key])
+        return cache
         
     def _init_empty_cache(self):
         return {
-            "forecast_queue": [],
+            "forecast_queue": deque(),
             "assets": {
                 "vuln_commands": [],
                 "honeytoken_commands": []
             }
         }
 
-    def save_cache(self):
-        with open(self.cache_file, 'w') as f:
-            json.dump(self.cache, f, indent=4)
+    def save_cache(self, section=None, sync=None):
+        """Writes one cache section (or all of them) to its own file."""
+        if sync is None:
+            sync = not self.no_sync
+        with self._lock:
+            for name in (_SECTIONS if section is None else (section,)):
+                if name not in self.cache:
+                    continue
+                payload = self.cache[name]
+                if name in _QUEUE_KEYS:
+                    # A new epoch makes the cursors of the previous file stale
+                    self._epochs[name] += 1
+                    payload = {"epoch": self._epochs[name], "items": payload}
+                    self._cursors[name] = 0
+                _atomic_write(self._section_files[name], _dumps(payload), sync, backup=True)
+                self._dirty_sections.discard(name)
+
+    def _load_cursors(self):
+        """Re-applies pops recorded since each queue file was last written."""
+        self._cursors = dict.fromkeys(_QUEUE_KEYS, 0)
+        try:
+            with open(self.cache_file_cursors, 'rb') as f:
+                saved = _loads(f.read())
+        except:
+            return # Missing or unreadable: nothing consumed since last save
+        for key in _QUEUE_KEYS:
+            epoch, consumed = saved.get(key, (None, 0))
+            if epoch != self._epochs[key]:
+                continue # Queue was rewritten after these pops; already applied
+            queue = self.cache.get(key)
+            if queue:
+                for _ in range(min(consumed, len(queue))):
+                    queue.popleft()
+            self._cursors[key] = consumed
+
+    def _record_pop(self, key):
+        """Persists one queue pop by rewriting only the small cursor file."""
+        self._cursors[key] += 1
+        record = {k: (self._epochs[k], self._cursors[k]) for k in _QUEUE_KEYS}
+        # Losing a cursor only replays an item, so skip the fsync
+        _atomic_write(self.cache_file_cursors, _dumps(record), sync=False)
+        if self._cursors[key] >= self.CURSOR_COMPACT_AFTER:
+            self._dirty_sections.add(key)
+
+    def flush(self):
+        """Writes cache sections that have unsaved changes."""
+        with self._lock:
+            dirty = list(self._dirty_sections)
+        for section in dirty:
+            self.save_cache(section)
+
+    def _flush_interval(self):
+        """cache_flush_interval from config, if loaded; the flusher never forces the read."""
+        config = self._config or {}
+        return config.get("simulation", {}).get("cache_flush_interval", 5.0)
+
+    def _flush_loop(self):
+        """Background writer: persists dirty state every cache_flush_interval seconds."""
+        while not self._stop_flush.wait(self._flush_interval()):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Background cache flush failed: {e}")
+
+    def _final_flush(self):
+        self._stop_flush.set()
+        self.flush()
+
+    def close(self):
+        """
+        Stops the background flusher, drops the exit hook and writes pending
+        changes. For short-lived instances; safe to call more than once.
+        """
+        self._stop_flush.set()
+        if self._flush_thread is not threading.current_thread():
+            self._flush_thread.join()
+        atexit.unregister(self._final_flush)
+        self.flush()
+
+    @contextmanager
+    def batch(self):
+        """Groups several mutations into a single cache write."""
+        try:
+            yield self
+        finally:
+            self.flush()
 
     # --- Feature: Project State Management (The "Brain") ---
     def load_project_state(self):
         """Loads the persistent state of the virtual project (codebase)."""
         # project_state_file path is set in __init__
-        if os.path.exists(self.project_state_file):
-            with open(self.project_state_file, 'r') as f:
-                self.project_state = json.load(f)
-        else:
+        try:
+            with open(self.project_state_file, 'rb') as f:
+                self.project_state = _loads(f.read())
+        except FileNotFoundError:
             self.project_state = {
                 "project_name": "Core_App_V1",
                 "current_day": 1,
@@ -100,8 +436,7 @@ class ContentManager:
             self.save_project_state()
             
     def save_project_state(self):
-        with open(self.project_state_file, 'w') as f:
-            json.dump(self.project_state, f, indent=4)
+        _atomic_write(self.project_state_file, _dumps(self.project_state), not self.no_sync)
 
     def update_file_index(self, file_path, summary):
         """Updates the index of what code exists."""
@@ -114,10 +449,11 @@ class ContentManager:
     def get_file_content(self, file_path):
         """'Reads' a file from the fake file system (Context Tool)."""
         # In this simulation, we assume the file actually exists on disk if it was 'created'
-        if os.path.exists(file_path):
+        try:
             with open(file_path, 'r') as f:
                 return f.read()
-        return "[FILE NOT FOUND]"
+        except FileNotFoundError:
+            return "[FILE NOT FOUND]"
 
     def get_story_arc(self, user):
         """Retrieves the current standing story arc for a user."""
@@ -137,37 +473,47 @@ class ContentManager:
         logger.info(f"Generating forecast of {count} scenes...")
         scenes = self.llm.generate_batch_scenes(count)
         if scenes:
-            self.cache["forecast_queue"].extend(scenes)
-            self.save_cache()
+            with self._lock:
+                self.cache["forecast_queue"].extend(scenes)
+                self.save_cache("forecast_queue", sync=False) # Bulk import: atomic, fsync skipped
             logger.info(f"Forecast updated. Queue size: {len(self.cache['forecast_queue'])}")
         else:
             logger.error("Failed to generate forecast.")
 
     def get_next_forecast_scene(self):
         """Pops the next scene from the forecast queue."""
-        if self.cache["forecast_queue"]:
-            scene = self.cache["forecast_queue"].pop(0)
-            self.save_cache()
-            return scene
+        with self._lock:
+            if self.cache["forecast_queue"]:
+                scene = self.cache["forecast_queue"].popleft()
+                self._record_pop("forecast_queue")
+                return scene
         return None
 
     # --- Dynamic Persona Features ---
-    def load_personas(self, default_spec_file):
+    def load_personas(self, default_spec_file=None):
         """Loads personas from cache (dynamic) or falls back to spec (static)."""
+        if self._personas_cached is not None:
+            return self._personas_cached
+
         if "personas" in self.cache and self.cache["personas"]:
             logger.info("Loaded Dynamic Personas from Cache")
-            return self.cache["personas"]
+            self._personas_cached = self.cache["personas"]
+            return self._personas_cached
         
-        # Adjust path if relative
-        if not os.path.isabs(default_spec_file):
+        if default_spec_file is None:
+            default_spec_file = self.default_spec_file
+        elif not os.path.isabs(default_spec_file):
+            # Adjust path if relative
             default_spec_file = os.path.join(self.config_dir, default_spec_file)
 
         # Fallback
         if os.path.exists(default_spec_file):
-             with open(default_spec_file) as f:
-                 data = json.load(f)
-                 self.cache["personas"] = data
-                 self.save_cache()
+             with open(default_spec_file, 'rb') as f:
+                 data = _loads(f.read())
+                 with self._lock:
+                     self.cache["personas"] = data
+                     self._dirty_sections.add("personas")
+                 self._personas_cached = data
                  return data
                  
         # 3. Last Resort: Self-seed defaults
@@ -176,8 +522,10 @@ class ContentManager:
             "sys_bob": {"home_dir": "/home/sys_bob", "role": "SysAdmin", "skills": ["bash", "ansible"]},
             "svc_ci": {"home_dir": "/var/lib/jenkins", "role": "CI Bot", "skills": ["git", "make"]}
         }
-        self.cache["personas"] = defaults
-        self.save_cache()
+        with self._lock:
+            self.cache["personas"] = defaults
+            self._dirty_sections.add("personas")
+        self._personas_cached = defaults
         return defaults
 
     def evolve_personas(self):
@@ -203,11 +551,13 @@ class ContentManager:
                     logger.info(f"Promoting user {name} (Eligible)...")
                     new_data = self.llm.evolve_persona(data)
                     new_data["last_evolution"] = current_time
-                    self.cache["personas"][name] = new_data
+                    with self._lock:
+                        self.cache["personas"][name] = new_data
                     promoted_count += 1
         
         if promoted_count > 0:
-            self.save_cache()
+            self._personas_cached = None
+            self.save_cache("personas")
             logger.info(f"Evolution Complete: {promoted_count} users promoted.")
 
     # --- Breadcrumbs ---
@@ -216,20 +566,22 @@ class ContentManager:
         logs = self.llm.generate_breadcrumbs("logs")
         chats = self.llm.generate_breadcrumbs("chat")
         
-        if "breadcrumbs" not in self.cache:
-            self.cache["breadcrumbs"] = []
-            
-        self.cache["breadcrumbs"].extend(logs)
-        self.cache["breadcrumbs"].extend(chats)
-        self.save_cache()
+        with self._lock:
+            if "breadcrumbs" not in self.cache:
+                self.cache["breadcrumbs"] = deque()
+
+            self.cache["breadcrumbs"].extend(logs)
+            self.cache["breadcrumbs"].extend(chats)
+            self.save_cache("breadcrumbs")
         logger.info(f"Generated {len(logs) + len(chats)} new breadcrumbs.")
 
     def get_breadcrumb(self):
         """Retrieves and removes a breadcrumb to plant."""
-        if "breadcrumbs" in self.cache and self.cache["breadcrumbs"]:
-            crumb = self.cache["breadcrumbs"].pop(0)
-            self.save_cache()
-            return crumb
+        with self._lock:
+            if "breadcrumbs" in self.cache and self.cache["breadcrumbs"]:
+                crumb = self.cache["breadcrumbs"].popleft()
+                self._record_pop("breadcrumbs")
+                return crumb
         return None
 
     # --- Dynamic Asset Features ---
@@ -243,40 +595,60 @@ class ContentManager:
         
         new_vulns = self.llm.generate_content_assets("vuln")
         if new_vulns:
-            self.cache["assets"]["vuln_commands"] = new_vulns # Replace old with new
+            with self._lock:
+                self.cache["assets"]["vuln_commands"] = new_vulns # Replace old with new
         
         new_tokens = self.llm.generate_content_assets("honeytoken")
         if new_tokens:
-            self.cache["assets"]["honeytoken_commands"] = new_tokens
+            with self._lock:
+                self.cache["assets"]["honeytoken_commands"] = new_tokens
             
-        self.save_cache()
+        self.save_cache("assets", sync=False) # Bulk import: atomic, fsync skipped
         logger.info("Content Assets Refreshed.")
 
     def get_random_asset(self, asset_type):
         """Retrieves a random asset from cache, falling back to defaults."""
-        files = self.cache.get("assets", {}).get(f"{asset_type}_commands", [])
+        key = f"{asset_type}_commands"
+        files = self.cache.get("assets", {}).get(key, [])
         if files:
-            return random.choice(files)
+            return self._pick(key, files)
         # Fallback to templates.json if cache empty
         if self.templates:
-            return random.choice(self.templates.get(asset_type, []))
+            return self._pick(asset_type, self.templates.get(asset_type, []))
         return None
 
+    def _pick(self, key, items):
+        """
+        Returns a random element of items. Walks a cached shuffled order and
+        reshuffles after each full pass; the order is rebuilt when the pool
+        list is replaced or resized.
+        """
+        cursor = self._pick_cursors.get(key)
+        if cursor is None or cursor[0] is not items or len(cursor[1]) != len(items):
+            order = list(range(len(items)))
+            self._rng.shuffle(order)
+            cursor = self._pick_cursors[key] = [items, order, 0]
+
+        _, order, idx = cursor
+        item = items[order[idx]]
+        idx += 1
+        if idx == len(order):
+            self._rng.shuffle(order)
+            idx = 0
+        cursor[2] = idx
+        return item
+
     # --- Phase 4: Dynamic Triggers & Templates ---
     def load_dynamic_files(self):
         """Loads external JSONs for full dynamism, seeding defaults if missing."""
-        self.triggers = []
-        self.templates = {}
-        
-        # Paths
-        triggers_path = os.path.join(self.config_dir, "triggers.json")
-        templates_path = os.path.join(self.config_dir, "templates.json")
-        config_path = os.path.join(self.config_dir, "config.json")
-
-        # 1. Triggers
-        if os.path.exists(triggers_path):
-            with open(triggers_path) as f:
-                self.triggers = json.load(f)
+        self._load_triggers()
+        self._load_templates()
+        self.config = _load_json_file(self._paths["config"]) or {}
+
+    def _load_triggers(self):
+        triggers = _load_json_file(self._paths["triggers"])
+        if triggers is not None:
+            self.triggers = triggers
         else:
             self.triggers = [
                 {
@@ -295,11 +667,12 @@ class ContentManager:
                 }
             ]
             self.save_triggers()
-        
-        # 2. Templates
-        if os.path.exists(templates_path):
-            with open(templates_path) as f:
-                self.templates = json.load(f)
+
+    def _load_templates(self):
+        templates_path = self._paths["templates"]
+        templates = _load_json_file(templates_path)
+        if templates is not None:
+            self.templates = templates
         else:
             self.templates = {
                 "triggered_response": {
@@ -343,18 +716,10 @@ class ContentManager:
                 "vuln": ["chmod 777 -R /var/www"],
                 "honeytoken": ["echo 'aws_key=AKIA...' > ~/.aws/credentials"]
             }
-            with open(templates_path, "w") as f:
-                json.dump(self.templates, f, indent=4)
-
-        if os.path.exists(config_path):
-            with open(config_path) as f:
-                self.config = json.load(f)
-        else:
-            self.config = {}
+            _atomic_write(templates_path, _dumps(self.templates), not self.no_sync)
 
     def save_triggers(self):
-        with open(os.path.join(self.config_dir, "triggers.json"), "w") as f:
-            json.dump(self.triggers, f, indent=4)
+        _atomic_write(self._paths["triggers"], _dumps(self.triggers), not self.no_sync)
 
     def evolve_triggers(self):
         """Uses LLM to rewrite the system rules."""
@@ -369,21 +734,37 @@ class ContentManager:
                 logger.error(f"Failed to evolve triggers: {e}")
 
     def get_triggers(self):
-        if not hasattr(self, 'triggers'): self.load_dynamic_files()
         return self.triggers
+
+    def match_triggers(self, text):
+        """
+        Returns the trigger rules whose pattern occurs in text, in rule order.
+        All patterns are fused into one compiled alternation, so text that
+        matches nothing (the common case) is rejected in a single scan.
+        """
+        triggers = self.get_triggers()
+        if self._trigger_re_src is not triggers:
+            # Rebuilt whenever the list is replaced (reload, evolve_triggers)
+            patterns = {t["pattern"] for t in triggers if "pattern" in t}
+            self._trigger_re = re.compile("|".join(map(re.escape, patterns))) if patterns else None
+            self._trigger_re_src = triggers
+
+        if self._trigger_re is None or not self._trigger_re.search(text):
+            return []
+        return [t for t in triggers if "pattern" in t and t["pattern"] in text]
         
     def get_template(self, category="cache"):
-        if not hasattr(self, 'templates'): self.load_dynamic_files()
         pool = self.templates.get(category, None)
         
         if not pool: return None
         
-        # If it's a configuration dict (e.g., fuzzing rules), return as is
+        # Always a copy: callers fill in and apply noise to the scene they get
+        # If it's a configuration dict (e.g., fuzzing rules), return it whole
         if isinstance(pool, dict):
-            return pool
+            return copy.deepcopy(pool)
             
         # If it's a list (scenes), return a random choice
         if isinstance(pool, list):
-            return random.choice(pool)
+            return copy.deepcopy(self._pick(f"template:{category}", pool))
             
         return pool
@@ -1,30 +1,495 @@
 import os
+import asyncio
+import copy
+import functools
+import hashlib
 import json
 import logging
+import math
+import operator
 import random
+import re
+import string
+import threading
+import time
 import google.generativeai as genai
+from collections import OrderedDict, deque
 from dataclasses import dataclass
 
+try:
+    import orjson  # Optional: faster parsing of large responses
+except ImportError:
+    orjson = None
+
+try:
+    from google.api_core import exceptions as api_exceptions  # Ships with google-generativeai
+except ImportError:
+    api_exceptions = None
+
 # Configure Logging
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Markdown code fences the model wraps its JSON in
+_FENCE_RE = re.compile(r'```(?:json)?\s*')
+
+def _unit(vec):
+    """vec scaled to length 1 (as a tuple), or None for a zero vector."""
+    norm = math.sqrt(sum(x * x for x in vec))
+    if not norm:
+        return None
+    return tuple(x / norm for x in vec)
+
+def _json_loads(text):
+    """Parses JSON text (orjson if available). Errors are json.JSONDecodeError."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+# List-of-strings generators (content assets and breadcrumbs), by kind
+_ASSET_PROMPTS = {
+    "vuln": """
+    **TASK:** Generate 10 realistic 'Human Errors' or 'Vulnerabilities' for a deception environment.
+    **CONTEXT:** These will be planted to tempt attackers.
+    **EXAMPLES:** `chmod 777`, exposing keys in `.bash_history`, disabling ufw.
+    
+    **OUTPUT format:**
+    Return STRICT JSON List of strings (command sequences):
+    ["chmod 777 /var/www/html", "echo 'AWS_KEY=AKIA...' >> ~/.bashrc", ...]
+    """,
+    "honeytoken": """
+    **TASK:** Generate 10 sets of commands to create 'Honeytokens' (Fake Secrets).
+    **CONTEXT:** These files should look valuable to an attacker but trigger alerts when read.
+    **EXAMPLES:** `config.json` with fake DB creds, `id_rsa` keys, `aws_credentials`.
+    
+    **OUTPUT FORMAT:**
+    Return STRICT JSON List of strings:
+    ["echo 'DB_PASS=...' > config.json", "ssh-keygen -f id_rsa -N ''", ...]
+    """,
+    "logs": """
+    **TASK:** Generate 5 realistic Log Entries for `auth.log` or `syslog`.
+    **GOAL:** Hint at a vulnerability or hidden service to entice attackers.
+    **EXAMPLE:** `Failed password for root from 192.168.1.50 port 2222 ssh2`
+    
+    **OUTPUT:** STRICT JSON List of strings.
+    """,
+    "chat": """
+    **TASK:** Generate 5 short Chat Snippets (Slack/Teams style).
+    **GOAL:** Leak info about internal architecture or secrets.
+    **EXAMPLE:** "Did you rotate the staging DB keys yet?"
+    
+    **OUTPUT:** STRICT JSON List of strings.
+    """,
+}
+
+# response_schema values for structured (JSON mode) calls
+_STRING_LIST_SCHEMA = {"type": "array", "items": {"type": "string"}}
+_SCENE_PROPERTIES = {
+    "name": {"type": "string"},
+    "category": {"type": "string"},
+    "zone": {"type": "string"},
+    "commands": _STRING_LIST_SCHEMA,
+}
+_SCENE_SCHEMA = {
+    "type": "object",
+    "properties": _SCENE_PROPERTIES,
+    "required": ["name", "category", "zone", "commands"],
+}
+_SCENE_LIST_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {"user": {"type": "string"}, **_SCENE_PROPERTIES},
+        "required": ["user", "name", "category", "zone", "commands"],
+    },
+}
+_RESOLUTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string"},
+        "target_user": {"type": "string"},
+        "fix_command": {"type": "string"},
+        "reason": {"type": "string"},
+    },
+    "required": ["action", "target_user", "fix_command", "reason"],
+}
+
+def _compile_template(template):
+    """Splits a str.format template into (literal, field) parts once, for _render."""
+    return tuple((literal, field) for literal, field, _, _ in string.Formatter().parse(template))
+
+def _render(parts, values):
+    """Joins compiled template parts; no per-call format-string parsing."""
+    return "".join([literal + values[field] if field is not None else literal
+                    for literal, field in parts])
+
+def _json_mode(schema):
+    return {"response_mime_type": "application/json", "response_schema": schema}
+
+# genai.configure() drops the SDK's cached clients (and their open channels),
+# so it is only re-run when the key actually changes
+_configured_key = None
+_configure_lock = threading.Lock()
+
+def _configure_once(api_key):
+    global _configured_key
+    with _configure_lock:
+        if _configured_key != api_key:
+            # GEMINI_TRANSPORT: "grpc" (SDK default) or "rest"
+            genai.configure(api_key=api_key, transport=os.getenv("GEMINI_TRANSPORT") or None)
+            _configured_key = api_key
+
+@dataclass(frozen=True)
 class GeneratedScene:
+    # Explicit slots (dataclass(slots=True) needs 3.10); frozen + tuple
+    # commands make scenes hashable for dedup sets and cache keys
+    __slots__ = ("name", "category", "zone", "commands")
     name: str
     category: str
     zone: str
-    commands: list
+    commands: tuple
 
 class LLMProvider:
-    def __init__(self, api_key=None, model_name=None):
+    # Parsed responses of cache=True calls, keyed on sha256(model + prompt)
+    RESPONSE_CACHE_SIZE = 1024
+    RESPONSE_CACHE_TTL = 3600  # seconds
+    # Semantic layer under the exact cache: within a scope (e.g. one persona),
+    # a prompt whose embedding is this close to a cached one reuses its answer
+    EMBEDDING_MODEL = "models/text-embedding-004"
+    SEMANTIC_THRESHOLD = 0.95
+    SEMANTIC_CACHE_SCOPES = 256
+    SEMANTIC_CACHE_PER_SCOPE = 40
+    # After this many consecutive rate-limit errors, calls fail fast
+    # (callers fall back to static content) for BREAKER_COOLDOWN seconds
+    BREAKER_THRESHOLD = 3
+    BREAKER_COOLDOWN = 120
+    MAX_BACKOFF = 60  # seconds
+
+    # generate_dynamic_paths prompts, one per persona role
+    _PROMPT_DEV = """
+        **TASK:** Generate realistic working directories and project paths for a senior backend developer named {persona_name}.
+        
+        **CONTEXT:**
+        - Home directory: {home}
+        - Current month: {arc}
+        - Current task: {task}
+        
+        **REQUIREMENTS:**
+        Generate 5-8 realistic project directories and file paths that this developer would use.
+        Include a mix of active projects, archived work, and personal directories.
+        
+        **OUTPUT FORMAT:**
+        Return STRICT JSON:
+        {{
+            "active_projects": [
+                "{home}/repos/backend-api",
+                "{home}/repos/frontend-app", 
+                "{home}/repos/core-services"
+            ],
+            "archived_projects": [
+                "{home}/archive/old-api-v1",
+                "{home}/archive/legacy-system"
+            ],
+            "personal_dirs": [
+                "{home}/notes",
+                "{home}/scripts",
+                "{home}/experiments"
+            ],
+            "config_files": [
+                "{home}/.gitconfig",
+                "{home}/.ssh/config",
+                "{home}/.aws/credentials"
+            ],
+            "current_workspace": "{home}/repos/backend-api"
+        }}
+        """
+    _PROMPT_SYS = """
+        **TASK:** Generate realistic system administration paths for {persona_name}.
+        
+        **CONTEXT:**
+        - Home directory: {home}
+        - Role: Senior Systems Administrator
+        - Current focus: Infrastructure maintenance and monitoring
+        
+        **OUTPUT FORMAT:**
+        Return STRICT JSON:
+        {{
+            "log_dirs": ["/var/log", "/var/log/nginx", "/var/log/postgresql"],
+            "config_dirs": ["/etc/nginx", "/etc/postgresql", "/etc/ssh"],
+            "backup_dirs": ["/mnt/backup", "/mnt/backup/logs", "/mnt/backup/config"],
+            "monitoring_scripts": ["{home}/scripts/monitor.sh", "{home}/scripts/backup.sh"],
+            "current_workspace": "/var/log"
+        }}
+        """
+    _PROMPT_SVC = """
+        **TASK:** Generate realistic CI/CD workspace paths for {persona_name}.
+        
+        **OUTPUT FORMAT:**
+        Return STRICT JSON:
+        {{
+            "workspaces": ["/var/lib/jenkins/workspace/backend-api", "/var/lib/jenkins/workspace/frontend"],
+            "artifacts": ["/var/lib/jenkins/artifacts", "/var/lib/jenkins/artifacts/releases"],
+            "scripts": ["/var/lib/jenkins/scripts/deploy.sh", "/var/lib/jenkins/scripts/build.sh"],
+            "current_workspace": "/var/lib/jenkins/workspace/backend-api"
+        }}
+        """
+    _PROMPT_GENERIC = """
+        **TASK:** Generate realistic user directories for {persona_name}.
+        
+        **OUTPUT FORMAT:**
+        Return STRICT JSON:
+        {{
+            "personal_dirs": ["{home}/documents", "{home}/downloads", "{home}/projects"],
+            "config_files": ["{home}/.bashrc", "{home}/.vimrc"],
+            "current_workspace": "{home}"
+        }}
+        """
+    _PATH_PROMPTS = {
+        "dev": _PROMPT_DEV,
+        "sys": _PROMPT_SYS,
+        "svc": _PROMPT_SVC,
+        "generic": _PROMPT_GENERIC,
+    }
+    _PATH_PROMPT_PARTS = {role: _compile_template(t) for role, t in _PATH_PROMPTS.items()}
+
+    # _get_fallback_paths templates per persona role; "{home}" is substituted
+    _FALLBACK_PATHS = {
+        "dev": {
+            "active_projects": ["{home}/repos/backend-api", "{home}/repos/frontend"],
+            "archived_projects": ["{home}/archive/old-projects"],
+            "personal_dirs": ["{home}/notes", "{home}/scripts"],
+            "config_files": ["{home}/.gitconfig"],
+            "current_workspace": "{home}/repos/backend-api"
+        },
+        "sys": {
+            "log_dirs": ["/var/log", "/var/log/nginx"],
+            "config_dirs": ["/etc/nginx", "/etc/ssh"],
+            "backup_dirs": ["/mnt/backup"],
+            "monitoring_scripts": ["{home}/scripts/monitor.sh"],
+            "current_workspace": "/var/log"
+        },
+        "svc": {
+            "workspaces": ["/var/lib/jenkins/workspace/backend-api"],
+            "artifacts": ["/var/lib/jenkins/artifacts"],
+            "scripts": ["/var/lib/jenkins/scripts/deploy.sh"],
+            "current_workspace": "/var/lib/jenkins/workspace/backend-api"
+        },
+        "generic": {
+            "personal_dirs": ["{home}/documents"],
+            "config_files": ["{home}/.bashrc"],
+            "current_workspace": "{home}"
+        },
+    }
+
+    # Static head of every scene prompt. Sent as the system instruction so
+    # only the persona-specific tail varies.
+    _SCENE_PREAMBLE = """
+        # SYSTEM INSTRUCTION: CYBER DECEPTION ENGINE
+        You are simulating a realistic human (or bot) interaction with a Linux shell to deceive an adversary watching the logs.
+
+        **TASK**: Generate a structured 'Scene' object representing this user's next set of actions.
+        - Ensure a logical flow (e.g., cd -> ls -> edit -> run).
+        - Commands must be valid bash.
+        - 'zone' is the absolute path where this happens.
+
+        ## OUTPUT FORMAT
+        Return ONLY valid JSON. No markdown formatting.
+        {
+            "name": "Short Descriptive Title of Scene",
+            "category": "Routine" | "Variant" | "Anomaly",
+            "zone": "/absolute/path/to/working/directory",
+            "commands": [
+                "command 1",
+                "command 2",
+                ...
+            ]
+        }
+
+        **CRITICAL PATH REQUIREMENTS**:
+        - 'zone' MUST be an absolute path that actually exists or can be created
+        - Commands MUST use specific, realistic paths (no placeholders like <FILENAME>)
+        - NEVER use generic paths like "/tmp/test", "/path/to/", "/opt/sys_integrity/"
+        - NEVER use placeholder URLs like "<REMOTE_REPOSITORY_URL_HERE>"
+        - Use the specific paths listed in the persona profile below
+        """
+
+    # Scene tail pieces, per persona role (see _persona_role): the Role Type
+    # line, the path lists its section shows (with the default used when the
+    # dynamic paths lack one; "{home}" is substituted) and the section itself
+    _SCENE_ROLE_TYPES = {
+        "dev": "Software Developer",
+        "sys": "System Administrator",
+        "svc": "Automated Service / CI Bot",
+        "generic": "Standard User",
+    }
+    _SCENE_ROLE_PATHS = {
+        "dev": {
+            "active_projects": "{home}/repos/backend-api",
+            "archived_projects": "{home}/archive/old-projects",
+            "personal_dirs": "{home}/notes",
+        },
+        "sys": {
+            "log_dirs": "/var/log",
+            "config_dirs": "/etc/nginx",
+            "backup_dirs": "/mnt/backup",
+            "monitoring_scripts": "{home}/scripts/monitor.sh",
+        },
+        "svc": {
+            "workspaces": "/var/lib/jenkins/workspace/backend-api",
+            "artifacts": "/var/lib/jenkins/artifacts",
+            "scripts": "/var/lib/jenkins/scripts/deploy.sh",
+        },
+        "generic": {
+            "personal_dirs": "{home}/documents",
+            "config_files": "{home}/.bashrc",
+        },
+    }
+    _SCENE_ROLE_PARTS = {
+        "dev": _compile_template("""
+            **BEHAVIOR**:
+            - You are writing code, compiling, or debugging.
+            - Use realistic tools: git, vim/nano, make, docker, kubectl, python, go.
+            - If the task is 'Refactor', show `mv`, `sed`, or heavy git activity.
+            - If the task is 'Feature', show `mkdir`, `touch`, and content injection.
+            
+            **DYNAMIC WORKING ENVIRONMENT**:
+            - Active Projects: {active_projects}
+            - Archived Work: {archived_projects}
+            - Personal Space: {personal_dirs}
+            - Current Focus: {current_workspace}
+            
+            **PATH USAGE RULES**:
+            - Primary workspace: {current_workspace}
+            - Create subdirectories if needed (mkdir -p)
+            - Use project-specific paths from the active projects list
+            - Reference archived projects for context/history
+            - NEVER use generic paths like /tmp/test or /home/user/project
+            """),
+        "sys": _compile_template("""
+            **BEHAVIOR**:
+            - You are maintaining the infrastructure.
+            - Use: systemctl, journalctl, grep, chown, chmod, vim /etc/..., apt/yum.
+            - Focus on stability, logs, and configuration management.
+            
+            **DYNAMIC SYSTEM ENVIRONMENT**:
+            - Log Directories: {log_dirs}
+            - Config Locations: {config_dirs}
+            - Backup Storage: {backup_dirs}
+            - Monitoring Tools: {monitoring_scripts}
+            - Current Focus: {current_workspace}
+            
+            **PATH USAGE RULES**:
+            - Work in appropriate system directories
+            - Create backup directories if they don't exist (mkdir -p)
+            - Use log analysis commands on actual log files
+            - Reference real system paths, not generic placeholders
+            - NEVER use paths like /opt/sys_integrity/logs/ or /path/to/
+            """),
+        "svc": _compile_template("""
+            **BEHAVIOR**:
+            - You are a script or bot.
+            - High speed, repetitive, precise commands.
+            - Deploying artifacts, running tests, cleaning up tmp files.
+            
+            **DYNAMIC CI/CD ENVIRONMENT**:
+            - Build Workspaces: {workspaces}
+            - Artifact Storage: {artifacts}
+            - Automation Scripts: {scripts}
+            - Current Pipeline: {current_workspace}
+            
+            **PATH USAGE RULES**:
+            - Work in designated workspace directories
+            - Create artifact directories as needed
+            - Use real repository URLs, not placeholders
+            - Follow standard CI/CD directory structures
+            """),
+        "generic": _compile_template("""
+            **BEHAVIOR**: General command line usage.
+            
+            **DYNAMIC USER ENVIRONMENT**:
+            - Personal Directories: {personal_dirs}
+            - Config Files: {config_files}
+            - Current Location: {current_workspace}
+            
+            **PATH USAGE RULES**:
+            - Work in personal directory spaces
+            - Create directories as needed for organization
+            - Use realistic file paths, not generic placeholders
+            """),
+    }
+    _PLANNING_PARTS = _compile_template("""
+        **CURRENT OBJECTIVE (Monthly Arc)**: "{ctx_arc}"
+        **TODAY'S PROGRESS**: Day {ctx_day}
+        **SPECIFIC TASK**: "{ctx_task}"
+
+        *Your generated command history must DIRECTLY contribute to this specific task.*
+        """)
+    _WORK_DEEP = """
+            **MODE: DEEP WORK (High Detail)**
+            - The user is doing substantial work.
+            - GENERATE ACTUAL CONTENT: Use `cat <<EOF > filename` to create realistic code/config files.
+            - The code/config should be syntactically correct and relevant to the Task.
+            - Don't just `echo "code"`, write a small python function or valid json config.
+            """
+    _WORK_STANDARD = """
+            **MODE: STANDARD ACTIVITY**
+            - Efficient command usage.
+            - Navigation, checking status, short edits, git operations.
+            """
+    # Final assembly of the tail; the static instructions live in _SCENE_PREAMBLE
+    _SCENE_TAIL_PARTS = _compile_template("""
+        ## 1. PERSONA PROFILE
+        {role_description}
+        {specific_instructions}
+
+        ## 2. PLANNING CONTEXT
+        {planning_context}
+
+        ## 3. HISTORY
+        Last Activity: {recent_history}
+
+        ## 4. INSTRUCTIONS
+        {work_instruction}
+        """)
+
+    # Most LLM calls in flight at once when fanning out over personas
+    MAX_CONCURRENT_CALLS = 8
+
+    def __init__(self, api_key=None, model_name=None, config=None):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
-        self.model_name = model_name or os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        # Parsed config.json; scene prompts read its "llm" intensity settings
+        self.config = config if config is not None else {}
+        self.model_name = model_name or os.getenv("GEMINI_MODEL_DEFAULT") or os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        # Model per task tier: trivial text jobs go to a cheaper model,
+        # long-horizon planning and bulk scene generation to a stronger one
+        self.model_names = {
+            "cheap": os.getenv("GEMINI_MODEL_CHEAP", "gemini-1.5-flash-8b"),
+            "default": self.model_name,
+            "smart": os.getenv("GEMINI_MODEL_SMART", "gemini-1.5-pro"),
+        }
+        self._response_cache = OrderedDict()  # key -> (expires_at, parsed)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._semantic_cache = OrderedDict()  # (tier, scope) -> deque of (unit embedding, parsed)
+        self.semantic_hits = 0
+        self._plan_cache = {}  # narrative_arc -> {week_num: days}, from generate_full_plan
+        # Async calls run on one long-lived loop so the SDK's async channel,
+        # which is bound to the loop that created it, is reused across calls
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._breaker = {"open_until": 0, "fails": 0}
+        self._preamble_models = {}  # (tier, preamble) -> model carrying preamble
         
         if self.api_key:
-            genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel(self.model_name)
-            logger.info(f"LLM Provider initialized with model: {self.model_name}")
+            _configure_once(self.api_key)
+            by_name = {}
+            for name in self.model_names.values():
+                if name not in by_name:
+                    by_name[name] = genai.GenerativeModel(name)
+            self.models = {tier: by_name[name] for tier, name in self.model_names.items()}
+            self.model = self.models["default"]
+            logger.info("LLM Provider initialized with models: %s", self.model_names)
         else:
+            self.models = {}
             self.model = None
             logger.warning("No API Key provided. LLM Provider in MOCK mode.")
             
@@ -36,138 +501,250 @@ class LLMProvider:
         Returns a dict with various path categories for the persona.
         """
         home = persona_data.get('home_dir', f'/home/{persona_name}')
-        
+        response = self._call_llm(self._dynamic_paths_prompt(persona_name, home, context),
+                                  cache=True, semantic_scope=(persona_name, home),
+                                  schema=self._paths_schema(persona_name))
+        return self._paths_or_fallback(response, persona_name, home)
+
+    async def generate_dynamic_paths_async(self, persona_name, persona_data, context=None):
+        """Async twin of generate_dynamic_paths; shares its response cache."""
+        home = persona_data.get('home_dir', f'/home/{persona_name}')
+        response = await self._call_llm_async(self._dynamic_paths_prompt(persona_name, home, context),
+                                              cache=True, semantic_scope=(persona_name, home),
+                                              schema=self._paths_schema(persona_name))
+        return self._paths_or_fallback(response, persona_name, home)
+
+    def build_personas(self, personas):
+        """
+        Generates dynamic paths for several personas concurrently.
+
+        Args:
+            personas: Iterable of (persona_name, persona_data, context) tuples
+
+        Returns:
+            Dict of persona_name -> paths. The answers also land in the
+            response cache, so later generate_dynamic_paths calls for the
+            same personas are served without a round trip.
+        """
+        personas = list(personas)
+        results = self._run_batched([
+            lambda n=n, d=d, c=c: self.generate_dynamic_paths_async(n, d, c) for n, d, c in personas
+        ])
+        return {
+            name: paths if paths is not None
+            else self._paths_or_fallback(None, name, data.get('home_dir', f'/home/{name}'))
+            for (name, data, _), paths in zip(personas, results)
+        }
+
+    @staticmethod
+    def _persona_role(persona_name):
+        """Role key for a persona name: dev, sys, svc or generic."""
         if "dev" in persona_name:
-            prompt = f"""
-            **TASK:** Generate realistic working directories and project paths for a senior backend developer named {persona_name}.
-            
-            **CONTEXT:**
-            - Home directory: {home}
-            - Current month: {context.get('monthly_arc', 'Backend API Migration') if context else 'Backend API Migration'}
-            - Current task: {context.get('daily_task', 'API development') if context else 'API development'}
-            
-            **REQUIREMENTS:**
-            Generate 5-8 realistic project directories and file paths that this developer would use.
-            Include a mix of active projects, archived work, and personal directories.
-            
-            **OUTPUT FORMAT:**
-            Return STRICT JSON:
-            {{
-                "active_projects": [
-                    "{home}/repos/backend-api",
-                    "{home}/repos/frontend-app", 
-                    "{home}/repos/core-services"
-                ],
-                "archived_projects": [
-                    "{home}/archive/old-api-v1",
-                    "{home}/archive/legacy-system"
-                ],
-                "personal_dirs": [
-                    "{home}/notes",
-                    "{home}/scripts",
-                    "{home}/experiments"
-                ],
-                "config_files": [
-                    "{home}/.gitconfig",
-                    "{home}/.ssh/config",
-                    "{home}/.aws/credentials"
-                ],
-                "current_workspace": "{home}/repos/backend-api"
-            }}
-            """
-        elif "sys" in persona_name or "admin" in persona_name:
-            prompt = f"""
-            **TASK:** Generate realistic system administration paths for {persona_name}.
-            
-            **CONTEXT:**
-            - Home directory: {home}
-            - Role: Senior Systems Administrator
-            - Current focus: Infrastructure maintenance and monitoring
-            
-            **OUTPUT FORMAT:**
-            Return STRICT JSON:
-            {{
-                "log_dirs": ["/var/log", "/var/log/nginx", "/var/log/postgresql"],
-                "config_dirs": ["/etc/nginx", "/etc/postgresql", "/etc/ssh"],
-                "backup_dirs": ["/mnt/backup", "/mnt/backup/logs", "/mnt/backup/config"],
-                "monitoring_scripts": ["{home}/scripts/monitor.sh", "{home}/scripts/backup.sh"],
-                "current_workspace": "/var/log"
-            }}
-            """
-        elif "svc" in persona_name or "ci" in persona_name:
-            prompt = f"""
-            **TASK:** Generate realistic CI/CD workspace paths for {persona_name}.
-            
-            **OUTPUT FORMAT:**
-            Return STRICT JSON:
-            {{
-                "workspaces": ["/var/lib/jenkins/workspace/backend-api", "/var/lib/jenkins/workspace/frontend"],
-                "artifacts": ["/var/lib/jenkins/artifacts", "/var/lib/jenkins/artifacts/releases"],
-                "scripts": ["/var/lib/jenkins/scripts/deploy.sh", "/var/lib/jenkins/scripts/build.sh"],
-                "current_workspace": "/var/lib/jenkins/workspace/backend-api"
-            }}
-            """
-        else:
-            # Generic user
-            prompt = f"""
-            **TASK:** Generate realistic user directories for {persona_name}.
-            
-            **OUTPUT FORMAT:**
-            Return STRICT JSON:
-            {{
-                "personal_dirs": ["{home}/documents", "{home}/downloads", "{home}/projects"],
-                "config_files": ["{home}/.bashrc", "{home}/.vimrc"],
-                "current_workspace": "{home}"
-            }}
-            """
-        
+            return "dev"
+        if "sys" in persona_name or "admin" in persona_name:
+            return "sys"
+        if "svc" in persona_name or "ci" in persona_name:
+            return "svc"
+        return "generic"
+
+    def generate_dynamic_paths_multi(self, personas):
+        """
+        Generates dynamic paths for several personas with a single prompt.
+
+        Args:
+            personas: Iterable of (persona_name, persona_data, context) tuples
+
+        Returns:
+            Dict of persona_name -> paths. Each answer is also stored under
+            that persona's generate_dynamic_paths cache key, so later
+            single-persona calls are served from the cache. Personas already
+            in that cache are not asked about again; personas the model left
+            out get fallback paths.
+        """
+        entries = []
+        result = {}
+        for name, data, context in personas:
+            context = context or {}
+            home = data.get('home_dir', f'/home/{name}')
+            cached = self._cache_get(self._cache_key(self._dynamic_paths_prompt(name, home, context)))
+            if cached is not None:
+                result[name] = cached
+            else:
+                entries.append((name, home, context))
+        if not entries:
+            return result
+
+        lines = []
+        for name, home, context in entries:
+            role = self._persona_role(name)
+            keys = ", ".join(self._FALLBACK_PATHS[role])
+            lines.append(
+                f'- "{name}" (role: {role}) home {home}; '
+                f"month: {context.get('monthly_arc', 'Backend API Migration')}; "
+                f"task: {context.get('daily_task', 'API development')}; keys: {keys}"
+            )
+        users = "\n        ".join(lines)
+        prompt = f"""
+        **TASK:** Generate realistic working directories and file paths for each of these users of one company server.
+
+        **USERS:**
+        {users}
+
+        **REQUIREMENTS:**
+        - dev: 5-8 project directories and files (active projects, archived work, personal dirs, config files).
+        - sys: log, config and backup directories plus monitoring scripts in their home.
+        - svc: CI/CD workspaces, artifact stores and automation scripts.
+        - generic: personal directories and dotfiles.
+        - Every list value is a list of absolute paths; "current_workspace" is a single absolute path.
+
+        **OUTPUT FORMAT:**
+        Return STRICT JSON with one object per user, keyed by user name, using exactly the keys listed for that user:
+        {{
+            "user_name": {{"key": ["/absolute/path", ...], "current_workspace": "/absolute/path"}},
+            ...
+        }}
+        """
         response = self._call_llm(prompt)
+        if not isinstance(response, dict):
+            response = {}
+
+        for name, home, context in entries:
+            paths = response.get(name)
+            if isinstance(paths, dict) and paths:
+                self._cache_set(self._cache_key(self._dynamic_paths_prompt(name, home, context)), paths)
+                result[name] = paths
+            else:
+                result[name] = self._get_fallback_paths(name, home)
+        return result
+
+    def _paths_schema(self, persona_name):
+        """response_schema for a role's paths, derived from its fallback keys."""
+        template = self._FALLBACK_PATHS[self._persona_role(persona_name)]
+        return {
+            "type": "object",
+            "properties": {
+                key: _STRING_LIST_SCHEMA if isinstance(value, list) else {"type": "string"}
+                for key, value in template.items()
+            },
+            "required": list(template),
+        }
+
+    def _dynamic_paths_prompt(self, persona_name, home, context):
+        context = context or {}
+        return _render(self._PATH_PROMPT_PARTS[self._persona_role(persona_name)], {
+            "persona_name": persona_name,
+            "home": home,
+            "arc": context.get('monthly_arc', 'Backend API Migration'),
+            "task": context.get('daily_task', 'API development'),
+        })
+
+    def _paths_or_fallback(self, response, persona_name, home):
         if response and isinstance(response, dict):
             return response
         
         # Fallback to static paths if LLM fails
-        logger.warning(f"LLM path generation failed for {persona_name}, using fallbacks")
+        logger.warning("LLM path generation failed for %s, using fallbacks", persona_name)
         return self._get_fallback_paths(persona_name, home)
     
     def _get_fallback_paths(self, persona_name, home):
         """Fallback paths when LLM generation fails."""
-        if "dev" in persona_name:
-            return {
-                "active_projects": [f"{home}/repos/backend-api", f"{home}/repos/frontend"],
-                "archived_projects": [f"{home}/archive/old-projects"],
-                "personal_dirs": [f"{home}/notes", f"{home}/scripts"],
-                "config_files": [f"{home}/.gitconfig"],
-                "current_workspace": f"{home}/repos/backend-api"
-            }
-        elif "sys" in persona_name or "admin" in persona_name:
-            return {
-                "log_dirs": ["/var/log", "/var/log/nginx"],
-                "config_dirs": ["/etc/nginx", "/etc/ssh"],
-                "backup_dirs": ["/mnt/backup"],
-                "monitoring_scripts": [f"{home}/scripts/monitor.sh"],
-                "current_workspace": "/var/log"
-            }
-        elif "svc" in persona_name or "ci" in persona_name:
-            return {
-                "workspaces": ["/var/lib/jenkins/workspace/backend-api"],
-                "artifacts": ["/var/lib/jenkins/artifacts"],
-                "scripts": ["/var/lib/jenkins/scripts/deploy.sh"],
-                "current_workspace": "/var/lib/jenkins/workspace/backend-api"
-            }
-        else:
-            return {
-                "personal_dirs": [f"{home}/documents"],
-                "config_files": [f"{home}/.bashrc"],
-                "current_workspace": home
-            }
+        template = self._FALLBACK_PATHS[self._persona_role(persona_name)]
+        return {
+            key: [p.replace("{home}", home) for p in value] if isinstance(value, list)
+            else value.replace("{home}", home)
+            for key, value in template.items()
+        }
+
+    def _cache_key(self, prompt, tier="default"):
+        return hashlib.sha256((self.model_names[tier] + prompt).encode()).hexdigest()
+
+    def _cache_get(self, key):
+        entry = self._response_cache.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.cache_misses += 1
+            return None
+        self._response_cache.move_to_end(key)
+        self.cache_hits += 1
+        # Callers mutate what they get back; keep the cached copy pristine
+        return copy.deepcopy(entry[1])
+
+    def _cache_set(self, key, parsed):
+        self._response_cache[key] = (time.monotonic() + self.RESPONSE_CACHE_TTL, copy.deepcopy(parsed))
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
+
+    def _embed(self, prompt):
+        """Unit embedding of prompt, or None if embedding is unavailable."""
+        try:
+            result = genai.embed_content(model=self.EMBEDDING_MODEL, content=prompt)
+        except Exception as e:
+            logger.debug("Prompt embedding failed, skipping semantic cache: %s", e)
+            return None
+        return _unit(result["embedding"])
 
-    def _call_llm(self, prompt, retries=3):
+    async def _embed_async(self, prompt):
+        try:
+            result = await genai.embed_content_async(model=self.EMBEDDING_MODEL, content=prompt)
+        except Exception as e:
+            logger.debug("Prompt embedding failed, skipping semantic cache: %s", e)
+            return None
+        return _unit(result["embedding"])
+
+    def _semantic_get(self, scope, vec):
+        best, best_sim = None, self.SEMANTIC_THRESHOLD
+        for other, parsed in self._semantic_cache.get(scope, ()):
+            # Both are unit vectors, so the dot product is the cosine similarity
+            sim = sum(map(operator.mul, vec, other))
+            if sim >= best_sim:
+                best, best_sim = parsed, sim
+        if best is None:
+            return None
+        self._semantic_cache.move_to_end(scope)
+        self.semantic_hits += 1
+        return copy.deepcopy(best)
+
+    def _semantic_set(self, scope, vec, parsed):
+        entries = self._semantic_cache.get(scope)
+        if entries is None:
+            entries = self._semantic_cache[scope] = deque(maxlen=self.SEMANTIC_CACHE_PER_SCOPE)
+        entries.append((vec, copy.deepcopy(parsed)))
+        self._semantic_cache.move_to_end(scope)
+        if len(self._semantic_cache) > self.SEMANTIC_CACHE_SCOPES:
+            self._semantic_cache.popitem(last=False)
+
+    def _preamble_model(self, preamble, tier):
+        """
+        Model with preamble as its system instruction: a stable prefix the
+        API's implicit prompt caching can pick up across calls.
+        """
+        key = (tier, preamble)
+        model = self._preamble_models.get(key)
+        if model is None:
+            model = self._preamble_models[key] = genai.GenerativeModel(
+                self.model_names[tier], system_instruction=preamble)
+        return model
+
+    def _call_llm(self, prompt, retries=3, cache=False, tier="default", semantic_scope=None, preamble=None,
+                  schema=None):
         """
         Call the LLM with retry logic and robust JSON parsing.
 
         Args:
             prompt: The prompt to send to the LLM
             retries: Number of retry attempts for rate limiting
+            cache: Serve/store the parsed response in the response cache.
+                Only for prompts whose answer may be reused; content
+                generators rely on fresh output.
+            tier: Which model to use: "cheap", "default" or "smart"
+            semantic_scope: With cache, also reuse the answer to a near-identical
+                prompt (by embedding similarity) made under the same scope.
+                The scope must pin down everything the answer depends on
+                beyond wording, e.g. (persona_name, home).
+            preamble: Static instructions that precede prompt, sent as the
+                model's system instruction.
+            schema: response_schema for the reply. The call then runs in JSON
+                mode, so the reply parses directly without extraction.
 
         Returns:
             Parsed JSON response or None on failure
@@ -176,81 +753,290 @@ class LLMProvider:
             logger.error("LLM Call Failed: No API Key configured.")
             return None
 
-        import re
-        import time
+        if cache:
+            key = self._cache_key((preamble or "") + prompt, tier)
+            parsed = self._cache_get(key)
+            if parsed is None:
+                vec = self._embed(prompt) if semantic_scope is not None else None
+                if vec is not None:
+                    parsed = self._semantic_get((tier, semantic_scope), vec)
+                if parsed is None:
+                    parsed = self._call_llm(prompt, retries, tier=tier, preamble=preamble, schema=schema)
+                    if parsed is not None and vec is not None:
+                        self._semantic_set((tier, semantic_scope), vec, parsed)
+                if parsed is not None:
+                    self._cache_set(key, parsed)
+            return parsed
 
+        model = self._preamble_model(preamble, tier) if preamble else self.models[tier]
+
+        kwargs = {"generation_config": _json_mode(schema)} if schema else {}
         for attempt in range(retries):
+            if self._breaker_open():
+                return None
             try:
-                response = self.model.generate_content(prompt)
-                text = response.text
-
-                # Robust JSON extraction
-                # 1. Remove markdown code blocks
-                text = re.sub(r'```json\s*', '', text)
-                text = re.sub(r'```\s*', '', text)
-                text = text.strip()
-
-                # 2. Try to find JSON object or array boundaries
-                json_match = re.search(r'(\{[\s\S]*\}|\[[\s\S]*\])', text)
-                if json_match:
-                    text = json_match.group(1)
-
-                # 3. Parse JSON
-                parsed = json.loads(text)
-
-                # 4. Basic validation for scene objects
-                if isinstance(parsed, dict):
-                    # Ensure required fields exist for scene objects
-                    if 'commands' in parsed:
-                        if not isinstance(parsed['commands'], list):
-                            parsed['commands'] = [str(parsed['commands'])]
-                        # Filter out empty commands
-                        parsed['commands'] = [c for c in parsed['commands'] if c and str(c).strip()]
-
-                    # Ensure zone is absolute path
-                    if 'zone' in parsed and not parsed['zone'].startswith('/'):
-                        parsed['zone'] = '/tmp'
-
-                return parsed
-
-            except json.JSONDecodeError as e:
-                logger.warning(f"JSON Parse Error (attempt {attempt+1}): {e}")
-                logger.debug(f"Raw response: {text[:500]}...")
-
-                # Try one more extraction method - find first { to last }
-                try:
-                    start = text.find('{')
-                    end = text.rfind('}')
-                    if start != -1 and end != -1 and end > start:
-                        return json.loads(text[start:end+1])
-                except:
-                    pass
-
+                response = model.generate_content(prompt, **kwargs)
+                self._breaker["fails"] = 0
+                return self._parse_response(response.text, attempt, structured=bool(schema))
+            except json.JSONDecodeError:
                 if attempt < retries - 1:
                     continue
                 return None
-
             except Exception as e:
-                error_str = str(e)
-                if "429" in error_str or "quota" in error_str.lower():
-                    wait_time = (2 ** attempt) * 5  # Exponential backoff: 5, 10, 20s
-                    logger.warning(f"LLM Rate Limit Hit. Waiting {wait_time}s before retry {attempt+1}/{retries}...")
-                    time.sleep(wait_time)
-                    continue
+                wait_time = self._retry_wait(e, attempt, retries)
+                if wait_time is None:
+                    return None
+                time.sleep(wait_time)
+
+        return None
 
-                logger.error(f"LLM Error: {e}")
+    def _run_async(self, coro):
+        """Runs coro on the provider's background event loop and waits for its result."""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def _call_llm_stream(self, prompt, tier="default"):
+        """
+        Streams a plain-text reply, yielding chunks as they arrive.
+
+        For text callers only; JSON callers need the whole buffer and go
+        through _call_llm. Yields nothing more after an error.
+        """
+        if not self.model:
+            logger.error("LLM Call Failed: No API Key configured.")
+            return
+        if self._breaker_open():
+            return
+
+        try:
+            for chunk in self.models[tier].generate_content(prompt, stream=True):
+                yield chunk.text
+        except Exception as e:
+            logger.error("LLM Error: %s", e)
+
+    async def _call_llm_async(self, prompt, retries=3, cache=False, tier="default", semantic_scope=None,
+                              preamble=None, schema=None):
+        """Async twin of _call_llm, using the SDK's generate_content_async."""
+        if not self.model:
+            logger.error("LLM Call Failed: No API Key configured.")
+            return None
+
+        if cache:
+            key = self._cache_key((preamble or "") + prompt, tier)
+            parsed = self._cache_get(key)
+            if parsed is None:
+                vec = await self._embed_async(prompt) if semantic_scope is not None else None
+                if vec is not None:
+                    parsed = self._semantic_get((tier, semantic_scope), vec)
+                if parsed is None:
+                    parsed = await self._call_llm_async(prompt, retries, tier=tier, preamble=preamble, schema=schema)
+                    if parsed is not None and vec is not None:
+                        self._semantic_set((tier, semantic_scope), vec, parsed)
+                if parsed is not None:
+                    self._cache_set(key, parsed)
+            return parsed
+
+        model = self._preamble_model(preamble, tier) if preamble else self.models[tier]
+        kwargs = {"generation_config": _json_mode(schema)} if schema else {}
+        for attempt in range(retries):
+            if self._breaker_open():
                 return None
+            try:
+                response = await model.generate_content_async(prompt, **kwargs)
+                self._breaker["fails"] = 0
+                return self._parse_response(response.text, attempt, structured=bool(schema))
+            except json.JSONDecodeError:
+                if attempt < retries - 1:
+                    continue
+                return None
+            except Exception as e:
+                wait_time = self._retry_wait(e, attempt, retries)
+                if wait_time is None:
+                    return None
+                await asyncio.sleep(wait_time)
+
+        return None
+
+    def _breaker_open(self):
+        if self._breaker["open_until"] > time.monotonic():
+            logger.debug("LLM circuit breaker open, skipping call")
+            return True
+        return False
 
+    @staticmethod
+    def _classify_error(e):
+        """'rate_limit', 'transient' or None (not worth retrying)."""
+        if api_exceptions is not None:
+            if isinstance(e, api_exceptions.TooManyRequests):  # Incl. ResourceExhausted
+                return "rate_limit"
+            if isinstance(e, (api_exceptions.DeadlineExceeded, api_exceptions.ServiceUnavailable)):
+                return "transient"
+        error_str = str(e)
+        if "429" in error_str or "quota" in error_str.lower():
+            return "rate_limit"
         return None
 
+    def _retry_wait(self, e, attempt, retries):
+        """Seconds to back off before retrying after e, or None to give up."""
+        kind = self._classify_error(e)
+        if kind is None:
+            logger.error("LLM Error: %s", e)
+            return None
+
+        if kind == "rate_limit":
+            self._breaker["fails"] += 1
+            if self._breaker["fails"] >= self.BREAKER_THRESHOLD:
+                self._breaker["open_until"] = time.monotonic() + self.BREAKER_COOLDOWN
+                self._breaker["fails"] = 0
+                logger.warning("LLM rate limited %dx in a row. Using fallbacks for %ss.", self.BREAKER_THRESHOLD, self.BREAKER_COOLDOWN)
+                return None
+
+        if attempt >= retries - 1:
+            logger.error("LLM Error after %d attempts: %s", retries, e)
+            return None
+
+        # Full jitter keeps concurrent callers from retrying in lockstep
+        wait_time = random.uniform(0, min(self.MAX_BACKOFF, (2 ** attempt) * 5))
+        logger.warning("LLM %s error. Waiting %.1fs before retry %d/%d...", kind.replace('_', ' '), wait_time, attempt + 1, retries)
+        return wait_time
+
+    def _parse_response(self, text, attempt=0, structured=False):
+        """
+        Robust JSON extraction from a model reply.
+
+        structured replies (JSON mode) are parsed as-is first; the
+        extraction steps only run if that fails.
+        Raises json.JSONDecodeError if no JSON could be recovered.
+        """
+        if structured:
+            try:
+                return _json_loads(text)
+            except json.JSONDecodeError:
+                pass
+
+        # 1. Remove markdown code blocks
+        text = _FENCE_RE.sub('', text).strip()
+
+        # 2. Parse JSON; most replies are clean at this point
+        try:
+            parsed = _json_loads(text)
+        except json.JSONDecodeError as e:
+            # 3. Prose around the payload: cut from the first opening
+            # bracket to the last matching closer, objects and arrays
+            # in the order they appear
+            spans = sorted((text.find(o), text.rfind(c)) for o, c in (('{', '}'), ('[', ']')))
+            for start, end in spans:
+                if start != -1 and end > start:
+                    try:
+                        parsed = _json_loads(text[start:end+1])
+                        break
+                    except json.JSONDecodeError:
+                        pass
+            else:
+                logger.warning("JSON Parse Error (attempt %d): %s", attempt + 1, e)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Raw response: %s...", text[:500])
+                raise
+
+        return parsed
+
+    @staticmethod
+    def _normalize_scene(scene):
+        """Basic validation for a scene object, in place. Non-dicts pass through."""
+        if isinstance(scene, dict):
+            if 'commands' in scene:
+                if not isinstance(scene['commands'], list):
+                    scene['commands'] = [str(scene['commands'])]
+                # Filter out empty commands
+                scene['commands'] = [c for c in scene['commands'] if c and str(c).strip()]
+
+            # Ensure zone is absolute path
+            zone = scene.get('zone')
+            if zone is not None and not (isinstance(zone, str) and zone.startswith('/')):
+                scene['zone'] = '/tmp'
+        return scene
+
     def generate_scene(self, persona_name, persona_data, context):
-        """Generates a single scene (Standard Mode)."""
-        prompt = self._construct_prompt(persona_name, persona_data, context)
-        return self._call_llm(prompt)
+        """
+        Generates a single scene (Standard Mode).
+
+        Scenes are reused for a near-identical prompt from the same persona
+        working the same arc and task in the same week, right after the same
+        last activity, so a persona never gets its previous scene back.
+        """
+        tail = self._scene_prompt_tail(persona_name, persona_data, context)
+        return self._normalize_scene(self._call_llm(
+            tail, cache=True, semantic_scope=self._scene_scope(persona_name, persona_data, context),
+            preamble=self._SCENE_PREAMBLE, schema=_SCENE_SCHEMA))
+
+    def generate_scenes(self, requests):
+        """
+        Generates scenes for several personas concurrently, so a cycle waits
+        on the slowest call rather than on the sum of them.
+
+        Args:
+            requests: Iterable of (persona_name, persona_data, context) tuples
+
+        Returns:
+            List of scenes (None where a call failed), in request order.
+        """
+        requests = list(requests)
+        # Every tail needs the persona's dynamic paths; fetch them all in one
+        # prompt so the tails below are served from the response cache
+        self.generate_dynamic_paths_multi(requests)
+        jobs = [(self._scene_prompt_tail(n, d, c), self._scene_scope(n, d, c)) for n, d, c in requests]
+        scenes = self._run_batched([
+            lambda tail=tail, scope=scope: self._call_llm_async(
+                tail, cache=True, semantic_scope=scope, preamble=self._SCENE_PREAMBLE, schema=_SCENE_SCHEMA)
+            for tail, scope in jobs
+        ])
+        return [self._normalize_scene(scene) for scene in scenes]
+
+    def _call_llm_many(self, prompts, **opts):
+        """_call_llm for several prompts, run concurrently; results in prompt order."""
+        return self._run_batched([lambda prompt=prompt: self._call_llm_async(prompt, **opts) for prompt in prompts])
+
+    def _run_batched(self, calls):
+        """
+        Awaits coroutine factories with at most MAX_CONCURRENT_CALLS in
+        flight. Results come back in order; a call that raised yields None.
+        """
+        async def gather_all():
+            gate = asyncio.Semaphore(self.MAX_CONCURRENT_CALLS)
+
+            async def bounded(call):
+                async with gate:
+                    return await call()
+
+            return await asyncio.gather(*(bounded(call) for call in calls), return_exceptions=True)
+
+        results = []
+        for result in self._run_async(gather_all()):
+            if isinstance(result, Exception):
+                logger.error("LLM Error: %s", result)
+                result = None
+            results.append(result)
+        return results
+
+    def _scene_scope(self, persona_name, persona_data, context):
+        """Semantic cache scope for a scene: who, on what, when, after what."""
+        ctx_arc, ctx_day, ctx_task, recent_history = self._scene_context(context)
+        try:
+            week = int(ctx_day) // 7
+        except (TypeError, ValueError):
+            week = ctx_day
+        return ("scene", persona_name, persona_data.get('home_dir'), ctx_arc, ctx_task, week, recent_history)
 
     def generate_batch_scenes(self, count=10):
         """Generates a batch of scenes for forecasting."""
-        prompt = f"""
+        return self._as_scene_list(
+            self._call_llm(self._batch_scenes_prompt(count), tier="smart", schema=_SCENE_LIST_SCHEMA))
+
+    def _batch_scenes_prompt(self, count):
+        return f"""
         **SYSTEM ROLE:**
         You are a Cyber Deception Architect simulating a realistic company network traffic.
         
@@ -277,80 +1063,146 @@ class LLMProvider:
             ...
         ]
         """
-        response = self._call_llm(prompt)
+
+    def _as_scene_list(self, response):
         # _call_llm might return a single dict if it parsed that way, force list expectation
-        if isinstance(response, list):
-            return response
-        elif isinstance(response, dict) and "scenes" in response:
-            return response["scenes"]
-        return [response] if response else []
+        if isinstance(response, dict) and "scenes" in response:
+            response = response["scenes"]
+        if not isinstance(response, list):
+            response = [response] if response else []
+        return [self._normalize_scene(scene) for scene in response]
 
     def generate_content_assets(self, asset_type):
         """Generates raw assets for ContentManager (vulnerabilities, honeytokens)."""
-        if asset_type == "vuln":
-            prompt = """
-            **TASK:** Generate 10 realistic 'Human Errors' or 'Vulnerabilities' for a deception environment.
-            **CONTEXT:** These will be planted to tempt attackers.
-            **EXAMPLES:** `chmod 777`, exposing keys in `.bash_history`, disabling ufw.
-            
-            **OUTPUT format:**
-            Return STRICT JSON List of strings (command sequences):
-            ["chmod 777 /var/www/html", "echo 'AWS_KEY=AKIA...' >> ~/.bashrc", ...]
-            """
-        elif asset_type == "honeytoken":
-            prompt = """
-            **TASK:** Generate 10 sets of commands to create 'Honeytokens' (Fake Secrets).
-            **CONTEXT:** These files should look valuable to an attacker but trigger alerts when read.
-            **EXAMPLES:** `config.json` with fake DB creds, `id_rsa` keys, `aws_credentials`.
-            
-            **OUTPUT FORMAT:**
-            Return STRICT JSON List of strings:
-            ["echo 'DB_PASS=...' > config.json", "ssh-keygen -f id_rsa -N ''", ...]
-            """
-        else:
+        return self._generate_list(asset_type)
+
+    def _generate_list(self, kind):
+        """Runs the _ASSET_PROMPTS generator for kind; always returns a list."""
+        prompt = _ASSET_PROMPTS.get(kind)
+        if not prompt:
             return []
+        return self._as_list(self._call_llm(prompt, schema=_STRING_LIST_SCHEMA))
 
+    def _as_list(self, response):
+        if isinstance(response, list):
+            return response
+        return []
 
+    def generate_corpus(self, scene_count=10, asset_types=("vuln", "honeytoken"), crumb_types=("logs", "chat")):
+        """
+        Offline driver for the bulk generators: scenes, content assets and
+        breadcrumbs are submitted together and awaited concurrently, instead
+        of one blocking call after another.
 
-    def generate_monthly_plan(self):
-        """Generates a cohesive narrative plan for the month."""
+        Returns:
+            {"scenes": [...], "assets": {type: [...]}, "breadcrumbs": {type: [...]}}.
+            Kinds whose call failed come back as empty lists, like their
+            interactive counterparts.
+        """
+        scene_opts = {"tier": "smart", "schema": _SCENE_LIST_SCHEMA}
+        list_opts = {"schema": _STRING_LIST_SCHEMA}
+        jobs = [("scenes", None, self._batch_scenes_prompt(scene_count), scene_opts, self._as_scene_list)]
+        jobs += [("assets", t, _ASSET_PROMPTS.get(t), list_opts, self._as_list) for t in asset_types]
+        jobs += [("breadcrumbs", t, _ASSET_PROMPTS.get(t), list_opts, self._as_list) for t in crumb_types]
+
+        async def submit(prompt, opts):
+            return await self._call_llm_async(prompt, **opts) if prompt else None
+
+        async def gather_all():
+            return await asyncio.gather(*(submit(prompt, opts) for _, _, prompt, opts, _ in jobs))
+
+        corpus = {"scenes": [], "assets": {}, "breadcrumbs": {}}
+        for (kind, sub, _, _, post), response in zip(jobs, self._run_async(gather_all())):
+            if sub is None:
+                corpus[kind] = post(response)
+            else:
+                corpus[kind][sub] = post(response)
+        return corpus
+
+
+
+    def generate_full_plan(self):
+        """
+        Generates the monthly arc and its four weekly breakdowns in one call.
+
+        The weekly breakdowns are kept in _plan_cache so generate_weekly_plan
+        can answer for this arc without another round trip.
+        """
         prompt = """
         **SYSTEM ROLE:**
         You are the Chief Technical Architect for a medium-sized technology company. 
-        Your goal is to define a month-long engineering initiative ("Narrative Arc") that provides context for 30 days of development activity.
+        Your goal is to define a month-long engineering initiative ("Narrative Arc") that provides context for 30 days of development activity,
+        and to plan its four weekly sprints as the Engineering Manager would.
         
         **CONTEXT:**
         - The "Deception Engine" uses this plan to generate realistic git commits and server logs.
         - The arc must be realistic (e.g., "Migration from AWS to Azure", "Major Refactor of Auth Service", "Security Compliance Sprint").
         
         **TASK:**
-        Generate a 'Monthly Work Plan'.
+        Generate a 'Monthly Work Plan' together with a day-by-day plan for each of its 4 weeks.
         
         **INSTRUCTIONS:**
         1. Choose a realistic theme/arc.
         2. Define a clear goal description.
         3. Break it down into 4 high-level weekly goals.
+        4. For each week, plan 7 days with logical progression (e.g., Setup -> Dev -> Test -> Deploy).
+           Number the days from the start of the month (week 1 is days 1-7, week 2 is days 8-14, ...).
+        5. 'expected_files' should be realistic file paths that might be touched.
         
         **OUTPUT FORMAT:**
         Return STRICT JSON in the following format:
         {
-            "month": "Current Month",
-            "narrative_arc": "Title of the Initiative",
-            "goal_description": "Brief description of the technical objectives.",
-            "weekly_high_level_goals": [
-                "Week 1: [Goal]",
-                "Week 2: [Goal]",
-                "Week 3: [Goal]",
-                "Week 4: [Goal]"
+            "monthly": {
+                "month": "Current Month",
+                "narrative_arc": "Title of the Initiative",
+                "goal_description": "Brief description of the technical objectives.",
+                "weekly_high_level_goals": [
+                    "Week 1: [Goal]",
+                    "Week 2: [Goal]",
+                    "Week 3: [Goal]",
+                    "Week 4: [Goal]"
+                ]
+            },
+            "weeks": [
+                {
+                    "week": 1,
+                    "days": [
+                        {
+                            "day": "1",
+                            "focus": "Brief Task Title (e.g., Setup Repo)",
+                            "expected_files": ["README.md", "requirements.txt"]
+                        },
+                        ...
+                    ]
+                },
+                ...
             ]
         }
         """
-        response = self._call_llm(prompt)
-        if isinstance(response, dict): return response
+        response = self._call_llm(prompt, tier="smart")
+        if not isinstance(response, dict) or not isinstance(response.get("monthly"), dict):
+            return None
+
+        weeks = {}
+        for i, week in enumerate(response.get("weeks") or [], 1):
+            if isinstance(week, dict) and isinstance(week.get("days"), list):
+                num = str(week.get("week", i))
+                weeks[int(num) if num.isdigit() else i] = week["days"]
+        self._plan_cache[response["monthly"].get("narrative_arc")] = weeks
+        return response
+
+    def generate_monthly_plan(self):
+        """Generates a cohesive narrative plan for the month."""
+        response = self.generate_full_plan()
+        if response: return response["monthly"]
         return None
 
     def generate_weekly_plan(self, monthly_context, week_num):
         """Breaks down the monthly goal into granular weekly objectives."""
+        days = self._plan_cache.get(monthly_context.get('narrative_arc'), {}).get(week_num)
+        if days:
+            return copy.deepcopy(days)
+
         prompt = f"""
         **SYSTEM ROLE:**
         You are an Engineering Manager planning the upcoming sprint (Week {week_num}).
@@ -485,7 +1337,19 @@ class LLMProvider:
 
     def generate_motd(self, username, daily_task, current_day):
         """Generates a dynamic Message of the Day for a user's login session."""
-        prompt = f"""
+        text = "".join(self.generate_motd_stream(username, daily_task, current_day))
+        # Clean up if LLM wraps in code blocks
+        text = text.replace("```", "").strip()
+        if text:
+            return text
+        return f"Welcome {username}.\nTask: {daily_task}"
+
+    def generate_motd_stream(self, username, daily_task, current_day):
+        """Yields the MOTD text as it streams in, for callers rendering to a TTY."""
+        return self._call_llm_stream(self._motd_prompt(username, daily_task, current_day), tier="cheap")
+
+    def _motd_prompt(self, username, daily_task, current_day):
+        return f"""
         User: {username}
         Project Day: {current_day}/30
         Today's Task: {daily_task}
@@ -509,11 +1373,6 @@ class LLMProvider:
         
         Return ONLY the raw MOTD text.
         """
-        response = self._call_llm(prompt)
-        # Clean up if LLM wraps in JSON or code blocks (fallback)
-        if isinstance(response, str):
-            return response.replace("```", "").strip()
-        return f"Welcome {username}.\nTask: {daily_task}"
 
     def evolve_persona(self, current_data):
         """Evolves a persona's role, shift, or skills based on current state."""
@@ -545,31 +1404,7 @@ class LLMProvider:
 
     def generate_breadcrumbs(self, crumb_type="logs"):
         """Generates fake artifacts (logs, chats) to mislead attackers."""
-        if crumb_type == "logs":
-            prompt = """
-            **TASK:** Generate 5 realistic Log Entries for `auth.log` or `syslog`.
-            **GOAL:** Hint at a vulnerability or hidden service to entice attackers.
-            **EXAMPLE:** `Failed password for root from 192.168.1.50 port 2222 ssh2`
-            
-            **OUTPUT:** STRICT JSON List of strings.
-            """
-        elif crumb_type == "chat":
-            prompt = """
-            **TASK:** Generate 5 short Chat Snippets (Slack/Teams style).
-            **GOAL:** Leak info about internal architecture or secrets.
-            **EXAMPLE:** "Did you rotate the staging DB keys yet?"
-            
-            **OUTPUT:** STRICT JSON List of strings.
-            """
-        else:
-            return []
-            
-        response = self._call_llm(prompt)
-        if isinstance(response, list):
-            return response
-        return []
-
-
+        return self._generate_list(crumb_type)
 
     def resolve_error(self, command, error_msg, user):
         """Analyzes a failure and decides how to fix or escalate it."""
@@ -595,7 +1430,7 @@ class LLMProvider:
             "reason": "Brief explanation"
         }}
         """
-        response = self._call_llm(prompt)
+        response = self._call_llm(prompt, tier="cheap", schema=_RESOLUTION_SCHEMA)
         if isinstance(response, dict):
             return response
         # Fallback
@@ -642,12 +1477,12 @@ class LLMProvider:
         return current_triggers
 
     def _construct_prompt(self, name, data, context=None):
-        # 1. Generate dynamic paths for this persona (living environment)
-        dynamic_paths = self.generate_dynamic_paths(name, data, context)
-        home = data.get('home_dir', '/tmp')
-        current_workspace = dynamic_paths.get('current_workspace', home)
+        """Full scene prompt: the static preamble followed by the persona tail."""
+        return self._SCENE_PREAMBLE + self._scene_prompt_tail(name, data, context)
 
-        # Default Context
+    @staticmethod
+    def _scene_context(context):
+        """(arc, day, task, recent_history) from a scene context, with defaults."""
         ctx_arc = "General System Maintenance"
         ctx_day = "Unknown"
         ctx_task = "Routine checkups"
@@ -664,178 +1499,63 @@ class LLMProvider:
             else:
                 # Fallback to simple string if that's what was passed
                 ctx_task = context.get('monthly_task', ctx_task)
+        return ctx_arc, ctx_day, ctx_task, recent_history
 
-        # 2. Define Persona Role & Voice with dynamic paths
-        role_description = f"User: {name}\nHome Directory: {home}\nCurrent Workspace: {current_workspace}\nRole Type: "
-
-        if "dev" in name:
-            role_description += "Software Developer"
-            active_projects = dynamic_paths.get('active_projects', [f"{home}/repos/backend-api"])
-            archived_projects = dynamic_paths.get('archived_projects', [f"{home}/archive/old-projects"])
-            personal_dirs = dynamic_paths.get('personal_dirs', [f"{home}/notes"])
-            
-            specific_instructions = f"""
-            **BEHAVIOR**:
-            - You are writing code, compiling, or debugging.
-            - Use realistic tools: git, vim/nano, make, docker, kubectl, python, go.
-            - If the task is 'Refactor', show `mv`, `sed`, or heavy git activity.
-            - If the task is 'Feature', show `mkdir`, `touch`, and content injection.
-            
-            **DYNAMIC WORKING ENVIRONMENT**:
-            - Active Projects: {', '.join(active_projects)}
-            - Archived Work: {', '.join(archived_projects)}
-            - Personal Space: {', '.join(personal_dirs)}
-            - Current Focus: {current_workspace}
-            
-            **PATH USAGE RULES**:
-            - Primary workspace: {current_workspace}
-            - Create subdirectories if needed (mkdir -p)
-            - Use project-specific paths from the active projects list
-            - Reference archived projects for context/history
-            - NEVER use generic paths like /tmp/test or /home/user/project
-            """
-        elif "sys" in name or "admin" in name:
-            role_description += "System Administrator"
-            log_dirs = dynamic_paths.get('log_dirs', ['/var/log'])
-            config_dirs = dynamic_paths.get('config_dirs', ['/etc/nginx'])
-            backup_dirs = dynamic_paths.get('backup_dirs', ['/mnt/backup'])
-            monitoring_scripts = dynamic_paths.get('monitoring_scripts', [f"{home}/scripts/monitor.sh"])
-            
-            specific_instructions = f"""
-            **BEHAVIOR**:
-            - You are maintaining the infrastructure.
-            - Use: systemctl, journalctl, grep, chown, chmod, vim /etc/..., apt/yum.
-            - Focus on stability, logs, and configuration management.
-            
-            **DYNAMIC SYSTEM ENVIRONMENT**:
-            - Log Directories: {', '.join(log_dirs)}
-            - Config Locations: {', '.join(config_dirs)}
-            - Backup Storage: {', '.join(backup_dirs)}
-            - Monitoring Tools: {', '.join(monitoring_scripts)}
-            - Current Focus: {current_workspace}
-            
-            **PATH USAGE RULES**:
-            - Work in appropriate system directories
-            - Create backup directories if they don't exist (mkdir -p)
-            - Use log analysis commands on actual log files
-            - Reference real system paths, not generic placeholders
-            - NEVER use paths like /opt/sys_integrity/logs/ or /path/to/
-            """
-        elif "svc" in name or "ci" in name:
-            role_description += "Automated Service / CI Bot"
-            workspaces = dynamic_paths.get('workspaces', ['/var/lib/jenkins/workspace/backend-api'])
-            artifacts = dynamic_paths.get('artifacts', ['/var/lib/jenkins/artifacts'])
-            scripts = dynamic_paths.get('scripts', ['/var/lib/jenkins/scripts/deploy.sh'])
-            
-            specific_instructions = f"""
-            **BEHAVIOR**:
-            - You are a script or bot.
-            - High speed, repetitive, precise commands.
-            - Deploying artifacts, running tests, cleaning up tmp files.
-            
-            **DYNAMIC CI/CD ENVIRONMENT**:
-            - Build Workspaces: {', '.join(workspaces)}
-            - Artifact Storage: {', '.join(artifacts)}
-            - Automation Scripts: {', '.join(scripts)}
-            - Current Pipeline: {current_workspace}
-            
-            **PATH USAGE RULES**:
-            - Work in designated workspace directories
-            - Create artifact directories as needed
-            - Use real repository URLs, not placeholders
-            - Follow standard CI/CD directory structures
-            """
-        else:
-            role_description += "Standard User"
-            personal_dirs = dynamic_paths.get('personal_dirs', [f"{home}/documents"])
-            config_files = dynamic_paths.get('config_files', [f"{home}/.bashrc"])
-            
-            specific_instructions = f"""
-            **BEHAVIOR**: General command line usage.
-            
-            **DYNAMIC USER ENVIRONMENT**:
-            - Personal Directories: {', '.join(personal_dirs)}
-            - Config Files: {', '.join(config_files)}
-            - Current Location: {current_workspace}
-            
-            **PATH USAGE RULES**:
-            - Work in personal directory spaces
-            - Create directories as needed for organization
-            - Use realistic file paths, not generic placeholders
-            """
+    def _scene_prompt_tail(self, name, data, context=None):
+        # 1. Generate dynamic paths for this persona (living environment)
+        dynamic_paths = self.generate_dynamic_paths(name, data, context)
+        home = data.get('home_dir', '/tmp')
+        current_workspace = dynamic_paths.get('current_workspace', home)
 
-        # 3. Define the Monthly Goal Context (The "Why")
-        planning_context = f"""
-        **CURRENT OBJECTIVE (Monthly Arc)**: "{ctx_arc}"
-        **TODAY'S PROGRESS**: Day {ctx_day}
-        **SPECIFIC TASK**: "{ctx_task}"
+        ctx_arc, ctx_day, ctx_task, recent_history = self._scene_context(context)
 
-        *Your generated command history must DIRECTLY contribute to this specific task.*
-        """
+        # 2. Path lists for the persona's role section
+        role = self._persona_role(name)
+        role_paths = tuple(
+            (key, ', '.join(dynamic_paths.get(key, [default.replace("{home}", home)])))
+            for key, default in self._SCENE_ROLE_PATHS[role].items()
+        )
 
-        # 4. Intensity & Realism modifiers
+        # 3. Intensity & Realism modifiers (drawn here so the render below stays pure)
         intensity_cfg = self.config.get("llm", {})
         deep_coding_chance = intensity_cfg.get("deep_coding_chance", 0.2)
 
         is_deep_work = random.random() < deep_coding_chance
 
-        if is_deep_work:
-            work_instruction = """
-            **MODE: DEEP WORK (High Detail)**
-            - The user is doing substantial work.
-            - GENERATE ACTUAL CONTENT: Use `cat <<EOF > filename` to create realistic code/config files.
-            - The code/config should be syntactically correct and relevant to the Task.
-            - Don't just `echo "code"`, write a small python function or valid json config.
-            """
-        else:
-            work_instruction = """
-            **MODE: STANDARD ACTIVITY**
-            - Efficient command usage.
-            - Navigation, checking status, short edits, git operations.
-            """
-
-        # 5. Final Assembly
-        prompt = f"""
-        # SYSTEM INSTRUCTION: CYBER DECEPTION ENGINE
-        You are simulating a realistic human (or bot) interaction with a Linux shell to deceive an adversary watching the logs.
-
-        ## 1. PERSONA PROFILE
-        {role_description}
-        {specific_instructions}
-
-        ## 2. PLANNING CONTEXT
-        {planning_context}
-
-        ## 3. HISTORY
-        Last Activity: {recent_history}
-
-        ## 4. INSTRUCTIONS
-        {work_instruction}
+        return self._render_scene_tail(name, role, home, current_workspace, role_paths,
+                                       str(ctx_arc), str(ctx_day), str(ctx_task), str(recent_history),
+                                       is_deep_work)
 
-        **TASK**: Generate a structured 'Scene' object representing this user's next set of actions.
-        - Ensure a logical flow (e.g., cd -> ls -> edit -> run).
-        - Commands must be valid bash.
-        - 'zone' is the absolute path where this happens.
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _render_scene_tail(name, role, home, current_workspace, role_paths,
+                           ctx_arc, ctx_day, ctx_task, recent_history, is_deep_work):
+        """
+        Renders the scene tail. Pure in its (hashable) arguments, so the
+        slowly changing persona/plan inputs are served from an LRU cache.
+        """
+        cls = LLMProvider
+        # Persona Role & Voice with dynamic paths
+        role_description = "\n".join((
+            f"User: {name}",
+            f"Home Directory: {home}",
+            f"Current Workspace: {current_workspace}",
+            f"Role Type: {cls._SCENE_ROLE_TYPES[role]}",
+        ))
 
-        ## 5. OUTPUT FORMAT
-        Return ONLY valid JSON. No markdown formatting.
-        {{
-            "name": "Short Descriptive Title of Scene",
-            "category": "Routine" | "Variant" | "Anomaly",
-            "zone": "/absolute/path/to/working/directory",
-            "commands": [
-                "command 1",
-                "command 2",
-                ...
-            ]
-        }}
+        role_values = dict(role_paths, current_workspace=current_workspace)
+        specific_instructions = _render(cls._SCENE_ROLE_PARTS[role], role_values)
 
-        **CRITICAL PATH REQUIREMENTS**:
-        - 'zone' MUST be an absolute path that actually exists or can be created
-        - Commands MUST use specific, realistic paths (no placeholders like <FILENAME>)
-        - NEVER use generic paths like "/tmp/test", "/path/to/", "/opt/sys_integrity/"
-        - NEVER use placeholder URLs like "<REMOTE_REPOSITORY_URL_HERE>"
-        - Use the specific paths listed in your persona profile above
-        """
+        # Monthly Goal Context (The "Why")
+        planning_context = _render(cls._PLANNING_PARTS, {
+            "ctx_arc": ctx_arc, "ctx_day": ctx_day, "ctx_task": ctx_task,
+        })
 
-        return prompt
+        # Final Assembly
+        return _render(cls._SCENE_TAIL_PARTS, {
+            "role_description": role_description,
+            "specific_instructions": specific_instructions,
+            "planning_context": planning_context,
+            "recent_history": recent_history,
+            "work_instruction": cls._WORK_DEEP if is_deep_work else cls._WORK_STANDARD,
+        })
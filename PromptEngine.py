@@ -16,11 +16,26 @@ The SPADE framework uses six components for structured prompts:
 This module provides superior prompt construction for realistic deception.
 """
 
+import bisect
+import copy
+import functools
+import hashlib
 import json
 import random
+import sys
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from dataclasses import dataclass, field
+from enum import IntEnum
+
+
+# Few-shot example categories. The literals are interned by the compiler;
+# categories that arrive at runtime are interned in PersonaProfile so the
+# _RENDERED_EXAMPLES lookup matches on identity.
+_DEVELOPER = "developer"
+_SYSADMIN = "sysadmin"
+_CICD = "cicd"
 
 
 @dataclass
@@ -37,6 +52,32 @@ class PersonaProfile:
     common_tasks: List[str]
     tools: List[str]
     home_dir: str
+    # Few-shot example set ("developer", "sysadmin" or "cicd"); derived from
+    # the username when not given
+    example_category: Optional[str] = None
+    # Prompt-ready renderings of skills/tools, joined once
+    skills_str: str = field(init=False, repr=False)
+    tools_str: str = field(init=False, repr=False)
+
+    def __post_init__(self):
+        if self.example_category is None:
+            self.example_category = _example_category(self.name)
+        else:
+            self.example_category = sys.intern(self.example_category)
+        self.skills_str = ', '.join(self.skills)
+        self.tools_str = ', '.join(self.tools)
+
+
+def _example_category(name: str) -> str:
+    """Classifies a username into a FEW_SHOT_EXAMPLES category."""
+    name = name.lower()
+    if "dev" in name:
+        return _DEVELOPER
+    elif "sys" in name or "admin" in name:
+        return _SYSADMIN
+    elif "svc" in name or "ci" in name:
+        return _CICD
+    return _DEVELOPER
 
 
 @dataclass
@@ -53,6 +94,117 @@ class ContextState:
     fingerprint_detected: bool = False
 
 
+# Constant skeleton of SPADEPrompt.render(), split around its six sections
+_RENDER_PARTS = (
+    "# SYSTEM INSTRUCTION: CYBER DECEPTION ENGINE\n\n## 1. IDENTITY & PERSONA\n",
+    "\n\n## 2. GOAL & TASK\n",
+    "\n\n## 3. THREAT CONTEXT\n",
+    "\n\n## 4. STRATEGY & CONSTRAINTS\n",
+    "\n\n## 5. OUTPUT EXAMPLES\n",
+    "\n\n## 6. OUTPUT FORMAT\n",
+    "\n",
+)
+
+_EXAMPLES_HEADER = "Here are examples of correctly formatted output:\n\n"
+
+# Static SPADE sections; only the fingerprint alert takes a value
+_THREAT_BASE = """**Deception Objective:**
+This system is a honeypot designed to deceive attackers. The commands you generate will be logged to `~/.bash_history` and executed to create realistic file system artifacts.
+
+**Anti-Detection Requirements:**
+1. Commands must be valid bash that will execute successfully
+2. Use realistic file paths (avoid generic `/tmp/test.txt`)
+3. Include natural variations (occasional typos corrected, status checks)
+4. Time-appropriate activity (respect work hours patterns)
+5. Maintain consistency with previous sessions"""
+
+_THREAT_ALERT = """
+
+**ALERT: Fingerprinting Attempt Detected**
+Threat Level: {threat_level}
+Adjust behavior to appear more realistic. Avoid patterns that reveal simulation."""
+
+_OUTPUT_FORMAT = """**Required Output Format:**
+Return ONLY valid JSON. No markdown, no explanation, no commentary.
+
+```json
+{
+    "name": "Brief descriptive title (e.g., 'Implement User Authentication')",
+    "category": "Routine" | "Variant" | "Anomaly",
+    "zone": "/absolute/path/to/working/directory",
+    "commands": [
+        "command 1",
+        "command 2",
+        "command 3"
+    ]
+}
+```
+
+**Validation Rules:**
+- `name`: 3-10 words describing the activity
+- `category`: Must be one of the three options
+- `zone`: Must be an absolute path that exists or can be created
+- `commands`: Array of 3-15 valid bash commands"""
+
+
+class Mode(IntEnum):
+    """Generation modes; each indexes its block in _MODE_INSTRUCTIONS."""
+    NORMAL = 0
+    DEEP_WORK = 1
+    QUICK = 2
+    ANOMALY = 3
+
+    @property
+    def label(self) -> str:
+        """Mode name as used in configs and logs ("deep_work", ...)."""
+        return self.name.lower()
+
+
+_MODES_BY_LABEL = {mode.label: mode for mode in Mode}
+
+
+def _as_mode(mode) -> Mode:
+    """Accepts a Mode, its int code or a legacy mode string; unknown names mean NORMAL."""
+    if isinstance(mode, int):
+        return Mode(mode)
+    return _MODES_BY_LABEL.get(mode, Mode.NORMAL)
+
+
+# Unthreatened mode distribution (60/25/10/5%): a roll in [0, 1) picks
+# _ROLL_MODES[i] for the first cumulative weight above it
+_CUM_WEIGHTS = (0.60, 0.85, 0.95, 1.0)
+_ROLL_MODES = (Mode.NORMAL, Mode.QUICK, Mode.DEEP_WORK, Mode.ANOMALY)
+
+# Mode-specific goals, indexed by Mode
+_MODE_INSTRUCTIONS = (
+    """
+
+Generate 4-7 commands representing a typical work segment (15-30 minutes of activity).""",
+
+    """
+
+**MODE: DEEP WORK SESSION**
+Generate 8-15 commands representing intensive development work.
+- Include actual file content creation using `cat <<EOF > filename`
+- Show debugging steps, test runs, and commits
+- The code you generate must be syntactically correct and relevant to the task""",
+
+    """
+
+**MODE: QUICK CHECK**
+Generate 2-4 commands for a quick status check or small task.
+- Brief session, checking status or making minor changes""",
+
+    """
+
+**MODE: INCIDENT RESPONSE**
+Generate 5-10 commands responding to an anomaly or incident.
+- Show investigation steps
+- Include log analysis
+- May include escalation or remediation""",
+)
+
+
 @dataclass
 class SPADEPrompt:
     """SPADE-style structured prompt."""
@@ -65,26 +217,15 @@ class SPADEPrompt:
 
     def render(self) -> str:
         """Render the complete prompt."""
-        return f"""# SYSTEM INSTRUCTION: CYBER DECEPTION ENGINE
-
-## 1. IDENTITY & PERSONA
-{self.identity}
-
-## 2. GOAL & TASK
-{self.goal}
-
-## 3. THREAT CONTEXT
-{self.threat_context}
-
-## 4. STRATEGY & CONSTRAINTS
-{self.strategy}
-
-## 5. OUTPUT EXAMPLES
-{self.examples}
-
-## 6. OUTPUT FORMAT
-{self.output_format}
-"""
+        return "".join((
+            _RENDER_PARTS[0], self.identity,
+            _RENDER_PARTS[1], self.goal,
+            _RENDER_PARTS[2], self.threat_context,
+            _RENDER_PARTS[3], self.strategy,
+            _RENDER_PARTS[4], self.examples,
+            _RENDER_PARTS[5], self.output_format,
+            _RENDER_PARTS[6],
+        ))
 
 
 class SPADEPromptEngine:
@@ -166,7 +307,7 @@ class SPADEPromptEngine:
 
     # Few-shot examples for consistent output
     FEW_SHOT_EXAMPLES = {
-        "developer": [
+        _DEVELOPER: [
             {
                 "name": "Feature Development - Add User Authentication",
                 "category": "Routine",
@@ -214,7 +355,7 @@ class SPADEPromptEngine:
                 ]
             }
         ],
-        "sysadmin": [
+        _SYSADMIN: [
             {
                 "name": "Daily System Health Check",
                 "category": "Routine",
@@ -257,7 +398,7 @@ class SPADEPromptEngine:
                 ]
             }
         ],
-        "cicd": [
+        _CICD: [
             {
                 "name": "Build Pipeline - Main Branch",
                 "category": "Routine",
@@ -281,10 +422,12 @@ class SPADEPromptEngine:
         """Initialize the prompt engine."""
         self.personas = personas or {}
         self.llm_provider = llm_provider
+        self._rng = random.Random()
         self._load_custom_profiles()
 
     def _load_custom_profiles(self):
         """Load custom persona profiles from configuration."""
+        added = False
         for name, data in self.personas.items():
             if name not in self.PERSONA_PROFILES:
                 # Create a basic profile from config
@@ -301,12 +444,17 @@ class SPADEPromptEngine:
                     tools=["bash"],
                     home_dir=data.get('home_dir', f'/home/{name}')
                 )
+                added = True
+        if added:
+            # Sections memoized by persona name may predate this profile
+            self._identity_for.cache_clear()
+            self._strategy_for.cache_clear()
 
     def build_prompt(
         self,
         persona_name: str,
         context: ContextState,
-        mode: str = "normal"
+        mode: Mode = Mode.NORMAL
     ) -> str:
         """
         Build a SPADE-style structured prompt.
@@ -314,7 +462,8 @@ class SPADEPromptEngine:
         Args:
             persona_name: The persona to generate commands for
             context: Current context state
-            mode: Generation mode (normal, deep_work, quick, anomaly)
+            mode: Generation mode; a Mode or its name (normal, deep_work,
+                quick, anomaly)
 
         Returns:
             Complete structured prompt string
@@ -323,6 +472,7 @@ class SPADEPromptEngine:
             persona_name,
             self._create_default_profile(persona_name)
         )
+        mode = _as_mode(mode)
 
         prompt = SPADEPrompt(
             identity=self._build_identity(profile),
@@ -335,7 +485,54 @@ class SPADEPromptEngine:
 
         return prompt.render()
 
-    def _create_default_profile(self, name: str) -> PersonaProfile:
+    def build_prompts_batch(
+        self,
+        persona_names: List[str],
+        contexts: List[ContextState],
+        modes: Optional[List[Mode]] = None
+    ) -> List[str]:
+        """
+        Build prompts for many personas in one pass (e.g. one planning tick).
+
+        Sections that do not vary per row (the output format and the threat
+        context for each threat state) are built once for the whole batch.
+
+        Args:
+            persona_names: Persona per row
+            contexts: Context state per row
+            modes: Generation mode (or mode name) per row (default: all NORMAL)
+
+        Returns:
+            Prompt strings, in row order
+        """
+        if modes is None:
+            modes = [Mode.NORMAL] * len(persona_names)
+
+        output_format = self._build_output_format()
+        threat_contexts = {}
+        prompts = []
+        for persona_name, context, mode in zip(persona_names, contexts, modes):
+            profile = self._profile_for(persona_name)
+            mode = _as_mode(mode)
+
+            threat_key = (context.fingerprint_detected, context.threat_level)
+            threat_context = threat_contexts.get(threat_key)
+            if threat_context is None:
+                threat_context = threat_contexts[threat_key] = self._build_threat_context(context)
+
+            prompts.append(SPADEPrompt(
+                identity=self._build_identity(profile),
+                goal=self._build_goal(profile, context, mode),
+                threat_context=threat_context,
+                strategy=self._build_strategy(profile, context, mode),
+                examples=self._build_examples(profile),
+                output_format=output_format
+            ).render())
+
+        return prompts
+
+    @staticmethod
+    def _create_default_profile(name: str) -> PersonaProfile:
         """Create a default profile for unknown personas."""
         return PersonaProfile(
             name=name,
@@ -353,6 +550,17 @@ class SPADEPromptEngine:
 
     def _build_identity(self, profile: PersonaProfile) -> str:
         """Build the identity/persona section."""
+        return self._identity_for(profile.name)
+
+    @classmethod
+    def _profile_for(cls, name: str) -> PersonaProfile:
+        return cls.PERSONA_PROFILES.get(name) or cls._create_default_profile(name)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _identity_for(name: str) -> str:
+        """Identity section for a persona; profiles don't change at runtime."""
+        profile = SPADEPromptEngine._profile_for(name)
         return f"""You are simulating **{profile.full_name}**, a {profile.seniority} {profile.role} at a technology company.
 
 **Profile:**
@@ -361,15 +569,15 @@ class SPADEPromptEngine:
 - Home Directory: `{profile.home_dir}`
 - Work Hours: {profile.work_hours[0]}:00 - {profile.work_hours[1]}:00
 
-**Technical Skills:** {', '.join(profile.skills)}
+**Technical Skills:** {profile.skills_str}
 
 **Communication Style:** {profile.communication_style}
 
-**Primary Tools:** {', '.join(profile.tools)}
+**Primary Tools:** {profile.tools_str}
 
 **CRITICAL:** You must behave EXACTLY like this person. Your commands should reflect their expertise level, habits, and role-specific tasks. An attacker analyzing the logs should believe this is a real person."""
 
-    def _build_goal(self, profile: PersonaProfile, context: ContextState, mode: str) -> str:
+    def _build_goal(self, profile: PersonaProfile, context: ContextState, mode: Mode) -> str:
         """Build the goal/task section with dynamic paths."""
         # Generate dynamic paths for this persona
         dynamic_paths = {}
@@ -384,97 +592,58 @@ class SPADEPromptEngine:
                 logger.warning(f"Failed to generate dynamic paths for {profile.name}: {e}")
                 dynamic_paths = self._get_fallback_paths(profile)
 
-        base_goal = f"""Generate a realistic sequence of shell commands that {profile.full_name} would execute right now.
+        parts = [f"""Generate a realistic sequence of shell commands that {profile.full_name} would execute right now.
 
 **Current Context:**
 - Project Day: {context.current_day}/30
 - Monthly Initiative: "{context.narrative_arc}"
 - Today's Focus: "{context.daily_task}"
 - Build Status: {context.build_status}
-- Current Project: {context.current_project}"""
+- Current Project: {context.current_project}"""]
 
         # Add dynamic environment information
         if dynamic_paths:
-            base_goal += f"""
+            parts.append(f"""
 
 **WORKING ENVIRONMENT:**
-- Current Workspace: {dynamic_paths.get('current_workspace', profile.home_dir)}"""
-            
+- Current Workspace: {dynamic_paths.get('current_workspace', profile.home_dir)}""")
+
             if 'active_projects' in dynamic_paths:
-                base_goal += f"""
-- Active Projects: {', '.join(dynamic_paths['active_projects'])}"""
-            
+                parts.append(f"\n- Active Projects: {', '.join(dynamic_paths['active_projects'])}")
+
             if 'log_dirs' in dynamic_paths:
-                base_goal += f"""
-- System Logs: {', '.join(dynamic_paths['log_dirs'])}"""
-            
+                parts.append(f"\n- System Logs: {', '.join(dynamic_paths['log_dirs'])}")
+
             if 'workspaces' in dynamic_paths:
-                base_goal += f"""
-- Build Workspaces: {', '.join(dynamic_paths['workspaces'])}"""
+                parts.append(f"\n- Build Workspaces: {', '.join(dynamic_paths['workspaces'])}")
 
         if context.recent_commands:
-            base_goal += f"""
+            parts.append(f"""
 
 **Recent Activity (last session):**
 ```
 {chr(10).join(context.recent_commands[-5:])}
 ```
-Continue from where the user left off logically."""
-
-        # Mode-specific goals
-        mode_instructions = {
-            "normal": """
-
-Generate 4-7 commands representing a typical work segment (15-30 minutes of activity).""",
-
-            "deep_work": """
-
-**MODE: DEEP WORK SESSION**
-Generate 8-15 commands representing intensive development work.
-- Include actual file content creation using `cat <<EOF > filename`
-- Show debugging steps, test runs, and commits
-- The code you generate must be syntactically correct and relevant to the task""",
-
-            "quick": """
-
-**MODE: QUICK CHECK**
-Generate 2-4 commands for a quick status check or small task.
-- Brief session, checking status or making minor changes""",
+Continue from where the user left off logically.""")
 
-            "anomaly": """
-
-**MODE: INCIDENT RESPONSE**
-Generate 5-10 commands responding to an anomaly or incident.
-- Show investigation steps
-- Include log analysis
-- May include escalation or remediation"""
-        }
-
-        return base_goal + mode_instructions.get(mode, mode_instructions["normal"])
+        parts.append(_MODE_INSTRUCTIONS[mode])
+        return "".join(parts)
 
     def _build_threat_context(self, context: ContextState) -> str:
         """Build the threat context section."""
-        base_context = """**Deception Objective:**
-This system is a honeypot designed to deceive attackers. The commands you generate will be logged to `~/.bash_history` and executed to create realistic file system artifacts.
-
-**Anti-Detection Requirements:**
-1. Commands must be valid bash that will execute successfully
-2. Use realistic file paths (avoid generic `/tmp/test.txt`)
-3. Include natural variations (occasional typos corrected, status checks)
-4. Time-appropriate activity (respect work hours patterns)
-5. Maintain consistency with previous sessions"""
-
         if context.fingerprint_detected:
-            base_context += """
+            return _THREAT_BASE + _THREAT_ALERT.format(threat_level=context.threat_level)
+        return _THREAT_BASE
 
-**ALERT: Fingerprinting Attempt Detected**
-Threat Level: {context.threat_level}
-Adjust behavior to appear more realistic. Avoid patterns that reveal simulation."""
-
-        return base_context
-
-    def _build_strategy(self, profile: PersonaProfile, context: ContextState, mode: str) -> str:
+    def _build_strategy(self, profile: PersonaProfile, context: ContextState, mode: Mode) -> str:
         """Build the strategy/constraints section."""
+        return self._strategy_for(profile.name)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _strategy_for(name: str) -> str:
+        """Strategy section for a persona; reads neither context nor mode."""
+        profile = SPADEPromptEngine._profile_for(name)
         return f"""**Operational Constraints:**
 1. All paths must be absolute or relative to `{profile.home_dir}`
 2. Commands must be executable on Ubuntu 22.04 LTS
@@ -498,52 +667,37 @@ Adjust behavior to appear more realistic. Avoid patterns that reveal simulation.
 
     def _build_examples(self, profile: PersonaProfile) -> str:
         """Build the few-shot examples section."""
-        # Select appropriate examples based on role
-        if "dev" in profile.name.lower():
-            examples = self.FEW_SHOT_EXAMPLES["developer"]
-        elif "sys" in profile.name.lower() or "admin" in profile.name.lower():
-            examples = self.FEW_SHOT_EXAMPLES["sysadmin"]
-        elif "svc" in profile.name.lower() or "ci" in profile.name.lower():
-            examples = self.FEW_SHOT_EXAMPLES["cicd"]
-        else:
-            examples = self.FEW_SHOT_EXAMPLES["developer"]
+        examples = self._RENDERED_EXAMPLES[profile.example_category]
 
         # Select 1-2 random examples
-        selected = random.sample(examples, min(2, len(examples)))
+        if len(examples) == 1:
+            selected = examples
+        else:
+            selected = self._rng.sample(examples, 2)
+        return _EXAMPLES_HEADER + "".join(ex[i] for i, ex in enumerate(selected))
 
-        examples_str = "Here are examples of correctly formatted output:\n\n"
-        for i, ex in enumerate(selected, 1):
-            examples_str += f"""**Example {i}: {ex['name']}**
+    @classmethod
+    def _precompute_examples(cls):
+        """
+        Serializes FEW_SHOT_EXAMPLES once. Each entry holds the example
+        rendered at every position it can take in a prompt (1st, 2nd).
+        """
+        cls._RENDERED_EXAMPLES = {
+            category: [
+                tuple(f"""**Example {i}: {ex['name']}**
 ```json
 {json.dumps(ex, indent=2)}
 ```
 
-"""
-        return examples_str
+""" for i in (1, 2))
+                for ex in examples
+            ]
+            for category, examples in cls.FEW_SHOT_EXAMPLES.items()
+        }
 
     def _build_output_format(self) -> str:
         """Build the output format specification."""
-        return """**Required Output Format:**
-Return ONLY valid JSON. No markdown, no explanation, no commentary.
-
-```json
-{
-    "name": "Brief descriptive title (e.g., 'Implement User Authentication')",
-    "category": "Routine" | "Variant" | "Anomaly",
-    "zone": "/absolute/path/to/working/directory",
-    "commands": [
-        "command 1",
-        "command 2",
-        "command 3"
-    ]
-}
-```
-
-**Validation Rules:**
-- `name`: 3-10 words describing the activity
-- `category`: Must be one of the three options
-- `zone`: Must be an absolute path that exists or can be created
-- `commands`: Array of 3-15 valid bash commands"""
+        return _OUTPUT_FORMAT
 
     def _get_fallback_paths(self, profile: PersonaProfile):
         """Fallback paths when LLM generation fails."""
@@ -578,6 +732,9 @@ Return ONLY valid JSON. No markdown, no explanation, no commentary.
             }
 
 
+SPADEPromptEngine._precompute_examples()
+
+
 class AdaptivePromptSelector:
     """
     Selects and adapts prompts based on threat context.
@@ -587,30 +744,41 @@ class AdaptivePromptSelector:
     "If attacker modifies code → Trigger bug discovery narrative"
     """
 
+    # LLM responses to previously issued prompts, keyed on prompt_key(prompt)
+    RESPONSE_CACHE_SIZE = 256
+
     def __init__(self, prompt_engine: SPADEPromptEngine):
         self.engine = prompt_engine
         self.threat_history = []
+        self._rng = random.Random()
+        self._response_cache = OrderedDict()
+        self.last_prompt_key = None  # key of the last generate_adaptive_prompt() result
 
-    def select_mode(self, context: ContextState) -> str:
-        """Select generation mode based on context."""
+    @staticmethod
+    def _mode_for(threat_level: str, fingerprint_detected: bool, roll: float) -> Mode:
+        """select_mode() decision tree over a pre-drawn roll in [0, 1)."""
         # Threat-adaptive selection
-        if context.threat_level == "critical":
-            return "anomaly"  # Simulate incident response
-        elif context.threat_level == "high":
-            return random.choice(["normal", "anomaly"])
-        elif context.fingerprint_detected:
-            return "deep_work"  # Generate more realistic, complex commands
+        if threat_level == "critical":
+            return Mode.ANOMALY  # Simulate incident response
+        elif threat_level == "high":
+            return Mode.NORMAL if roll < 0.5 else Mode.ANOMALY
+        elif fingerprint_detected:
+            return Mode.DEEP_WORK  # Generate more realistic, complex commands
 
         # Normal probability distribution
-        roll = random.random()
-        if roll < 0.60:
-            return "normal"
-        elif roll < 0.85:
-            return "quick"
-        elif roll < 0.95:
-            return "deep_work"
-        else:
-            return "anomaly"
+        return _ROLL_MODES[bisect.bisect_right(_CUM_WEIGHTS, roll)]
+
+    def select_mode(self, context: ContextState) -> Mode:
+        """Select generation mode based on context."""
+        return self._mode_for(context.threat_level, context.fingerprint_detected,
+                              self._rng.random())
+
+    def select_modes(self, contexts: List[ContextState]) -> List[Mode]:
+        """Select modes for many personas at once (e.g. one planning tick)."""
+        mode_for = self._mode_for
+        rand = self._rng.random
+        return [mode_for(c.threat_level, c.fingerprint_detected, rand())
+                for c in contexts]
 
     def generate_adaptive_prompt(
         self,
@@ -624,8 +792,50 @@ class AdaptivePromptSelector:
         self.threat_history.append({
             "timestamp": datetime.now().isoformat(),
             "threat_level": context.threat_level,
-            "mode_selected": mode,
+            "mode_selected": mode.label,
             "fingerprint_detected": context.fingerprint_detected
         })
 
-        return self.engine.build_prompt(persona_name, context, mode)
+        prompt = self.engine.build_prompt(persona_name, context, mode)
+        self.last_prompt_key = self.prompt_key(prompt)
+        return prompt
+
+    def generate_adaptive_prompts(
+        self,
+        persona_names: List[str],
+        contexts: List[ContextState]
+    ) -> List[str]:
+        """Batched generate_adaptive_prompt() for one planning tick, in row order."""
+        modes = self.select_modes(contexts)
+
+        # Record for analysis
+        timestamp = datetime.now().isoformat()
+        self.threat_history.extend({
+            "timestamp": timestamp,
+            "threat_level": context.threat_level,
+            "mode_selected": mode.label,
+            "fingerprint_detected": context.fingerprint_detected
+        } for context, mode in zip(contexts, modes))
+
+        return self.engine.build_prompts_batch(persona_names, contexts, modes)
+
+    @staticmethod
+    def prompt_key(prompt: str) -> bytes:
+        """Response-cache key for a rendered prompt."""
+        return hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+
+    def lookup(self, key: bytes):
+        """Cached response for a prompt key, or None. Check before calling the LLM."""
+        response = self._response_cache.get(key)
+        if response is None:
+            return None
+        self._response_cache.move_to_end(key)
+        # Callers mutate what they get back; keep the cached copy pristine
+        return copy.deepcopy(response)
+
+    def store(self, key: bytes, response):
+        """Caches the LLM response to a prompt, evicting the least recently used."""
+        self._response_cache[key] = copy.deepcopy(response)
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+            self._response_cache.popitem(last=False)
@@ -1,3 +1,4 @@
+import shutil
 import subprocess
 import os
 import pwd
@@ -11,9 +12,22 @@ logging.basicConfig(
     filename='/var/log/syslog-refactor.log'
 )
 
+# Resolved once: an absolute executable skips the PATH search on every spawn
+SUDO = shutil.which("sudo") or "/usr/bin/sudo"
+
 class GhostOrchestrator:
     def __init__(self):
         self.work_dir = "/opt/deception"
+        self._pw_cache = {}
+        self._env_cache = {}
+
+    def _pw(self, username):
+        """(uid, gid, home) for username, resolved through NSS only once."""
+        entry = self._pw_cache.get(username)
+        if entry is None:
+            info = pwd.getpwnam(username)
+            entry = self._pw_cache[username] = (info.pw_uid, info.pw_gid, info.pw_dir)
+        return entry
 
     def execute_as_persona(self, username, command):
         """
@@ -21,30 +35,18 @@ class GhostOrchestrator:
         """
         try:
             # Get user-specific IDs and home directory
-            user_info = pwd.getpwnam(username)
-            uid = user_info.pw_uid
-            gid = user_info.pw_gid
-            home = user_info.pw_dir
+            uid, gid, home = self._pw(username)
 
-            # Requirement: Process hiding and environment alignment [cite: 77]
-            # We set the environment variables to match the persona exactly
-            persona_env = os.environ.copy()
-            persona_env.update({
-                'HOME': home,
-                'USER': username,
-                'LOGNAME': username,
-                'SHELL': '/bin/bash',
-                'PATH': '/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin'
-            })
+            persona_env = self._get_persona_env(username, home)
 
             # Requirement: Update .bash_history for consistency [cite: 77]
             self._write_bash_history(home, command)
 
             # Step 3: Direct the Performance [cite: 39]
-            # Use setsid to detach from the orchestrator's process group
+            # New session (setsid) detaches from the orchestrator's process group
             process = subprocess.Popen(
-                ["sudo", "-u", username, "bash", "-c", f"cd {home} && {command}"],
-                preexec_fn=os.setsid,
+                [SUDO, "-u", username, "bash", "-c", f"cd {home} && {command}"],
+                start_new_session=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 env=persona_env,
@@ -63,14 +65,34 @@ class GhostOrchestrator:
         except Exception as e:
             logging.error(f"Execution failed: {str(e)}")
 
+    def _get_persona_env(self, username, home):
+        """Environment for the persona's commands; built once per user and reused."""
+        persona_env = self._env_cache.get(username)
+        if persona_env is None:
+            # Requirement: Process hiding and environment alignment [cite: 77]
+            # We set the environment variables to match the persona exactly
+            persona_env = os.environ.copy()
+            persona_env.update({
+                'HOME': home,
+                'USER': username,
+                'LOGNAME': username,
+                'SHELL': '/bin/bash',
+                'PATH': '/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin'
+            })
+            self._env_cache[username] = persona_env
+        return persona_env
+
     def _write_bash_history(self, home_dir, command):
         """Manually appends to history to ensure visibility for attackers[cite: 77]."""
         history_path = os.path.join(home_dir, ".bash_history")
         try:
-            with open(history_path, "a") as f:
-                f.write(f"{command}\n")
-            # Ensure the persona still owns their history file
-            os.chown(history_path, pwd.getpwnam(os.path.basename(home_dir)).pw_uid, -1)
+            fd = os.open(history_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, f"{command}\n".encode("utf-8", "replace"))
+                # Ensure the persona still owns their history file
+                os.fchown(fd, self._pw(os.path.basename(home_dir))[0], -1)
+            finally:
+                os.close(fd)
         except Exception as e:
             logging.error(f"History update failed: {e}")
 
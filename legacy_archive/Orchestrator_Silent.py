@@ -2,13 +2,37 @@ import os
 import pwd
 import time
 import json
+import heapq
 import random
+import select
+import signal
+import shlex
+import shutil
 import subprocess
 import setproctitle
 from datetime import datetime
 
+try:
+    import orjson  # Optional: faster persona spec parsing
+except ImportError:
+    orjson = None
+
 setproctitle.setproctitle("[kworker/u2:1-events]")
 
+# Resolved once: an absolute executable skips the PATH search on every spawn
+SUDO = shutil.which("sudo") or "/usr/bin/sudo"
+
+# [minute bucket, local hour]. is_active_window asks once per persona per
+# cycle, but the hour only changes on a minute boundary.
+_hour_cache = [None, 0]
+
+def current_hour():
+    """Local hour, read from the clock at most once a minute."""
+    bucket = int(time.time()) // 60
+    if bucket != _hour_cache[0]:
+        _hour_cache[:] = [bucket, datetime.now().hour]
+    return _hour_cache[1]
+
 class DeceptionEngine:
     def __init__(self):
         self.persona_file = "/etc/default/.sys-maint/worker-spec.json"
@@ -18,6 +42,15 @@ class DeceptionEngine:
             "Variant": 0.20,
             "Anomaly": 0.10
         }
+        # Parsed persona spec, reused until the file's mtime/size changes
+        self._persona_cache = None
+        self._persona_mtime = 0
+        self._persona_size = -1
+        self._pw_cache = {}
+        # One long-lived sudo'd bash per persona, fed commands on stdin
+        self._shells = {}
+        # Engine-owned generator: one bound stream for every draw the engine makes
+        self._rng = random.Random()
         self._init_state()
 
     def _init_state(self):
@@ -36,38 +69,107 @@ class DeceptionEngine:
 
     def load_personas(self):
         try:
-            with open(self.persona_file, 'r') as f:
-                return json.load(f)
+            st = os.stat(self.persona_file)
+            if (self._persona_cache is not None and st.st_mtime == self._persona_mtime
+                    and st.st_size == self._persona_size):
+                return self._persona_cache
+            with open(self.persona_file, 'rb') as f:
+                raw = f.read()
+            personas = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            for persona in personas.values():
+                self._index_scenes(persona)
         except Exception:
             return {}
+        self._persona_cache = personas
+        self._persona_mtime = st.st_mtime
+        self._persona_size = st.st_size
+        return personas
 
     def is_active_window(self, persona):
-        current_hour = datetime.now().hour
+        hour = current_hour()
         start, end = persona['work_hours']
-        is_in_shift = current_hour >= start or current_hour <= end if start > end else start <= current_hour <= end
+        is_in_shift = hour >= start or hour <= end if start > end else start <= hour <= end
         
         if is_in_shift:
-            return random.random() < persona.get("probability", 0.7)
-        return random.random() < 0.05 
+            return self._rng.random() < persona.get("probability", 0.7)
+        return self._rng.random() < 0.05
+
+    def _pw(self, username):
+        """(uid, gid, home) for username, resolved through NSS only once."""
+        entry = self._pw_cache.get(username)
+        if entry is None:
+            info = pwd.getpwnam(username)
+            entry = self._pw_cache[username] = (info.pw_uid, info.pw_gid, info.pw_dir)
+        return entry
+
+    def _shell(self, username):
+        shell = self._shells.get(username)
+        if shell is None or shell.poll() is not None:
+            shell = self._shells[username] = subprocess.Popen(
+                [SUDO, "-u", username, "bash"],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True, text=True
+            )
+        return shell
+
+    def _run_in_shell(self, username, line):
+        for _ in range(2):
+            shell = self._shell(username)
+            try:
+                shell.stdin.write(line)
+                shell.stdin.flush()
+                return
+            except (BrokenPipeError, ValueError):
+                # Shell died under us; respawn once and resend
+                self._shells.pop(username, None)
+
+    def close(self):
+        """Ends every persona shell: EOF on stdin lets bash exit after its jobs."""
+        for shell in self._shells.values():
+            try:
+                shell.stdin.close()
+            except (BrokenPipeError, ValueError):
+                pass
+        for shell in self._shells.values():
+            try:
+                shell.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                shell.kill()
+                shell.wait()
+        self._shells.clear()
 
-    def _write_bash_history(self, username, home_dir, command):
+    def _write_bash_history_bulk(self, username, home_dir, history_lines):
+        """Appends a whole scene's commands with a single write and chown."""
         history_path = os.path.join(home_dir, ".bash_history")
         try:
-            with open(history_path, "a") as f:
-                # Add timestamp comment to mimic real bash history if configured
-                f.write(f"{command}\n")
-            user_info = pwd.getpwnam(username)
-            os.chown(history_path, user_info.pw_uid, user_info.pw_gid)
+            # Raw O_APPEND write: no text-mode wrapper or buffering for one write
+            fd = os.open(history_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, history_lines.encode("utf-8", "replace"))
+                uid, gid, _ = self._pw(username)
+                os.fchown(fd, uid, gid)
+            finally:
+                os.close(fd)
         except:
             pass
 
+    @staticmethod
+    def _index_scenes(persona):
+        """Groups a persona's scenes by category once, at load time."""
+        by_category = {}
+        for s in persona.get('scenes', []):
+            by_category.setdefault(s.get('category'), []).append(s)
+        persona['_scenes_by_category'] = {cat: tuple(group) for cat, group in by_category.items()}
+        return persona['_scenes_by_category']
+
     def select_weighted_scene(self, persona, state, username):
         """Weighted Category Selection (Layer 2)"""
         scenes = persona.get('scenes', [])
         if not scenes: return None
+        by_category = persona.get('_scenes_by_category') or self._index_scenes(persona)
 
         # Filter scenes by weight/category
-        r = random.random()
+        r = self._rng.random()
         if r < 0.70:
             target_cat = "Routine"
         elif r < 0.90:
@@ -75,14 +177,14 @@ class DeceptionEngine:
         else:
             target_cat = "Anomaly"
 
-        eligible = [s for s in scenes if s.get('category') == target_cat]
+        eligible = by_category.get(target_cat, ())
         
         # Narrative Constraint: Don't repeat the exact last scene
         user_state = state['users'].get(username, {})
         last_scene = user_state.get('last_scene')
         
         final_pool = [s for s in eligible if s['name'] != last_scene]
-        return random.choice(final_pool if final_pool else eligible)
+        return self._rng.choice(final_pool if final_pool else eligible)
 
     def check_triggers(self, state, username):
         """Cross-User Narrative: Trigger Logic"""
@@ -111,24 +213,28 @@ class DeceptionEngine:
         target_dir = scene['zone']
         home = persona.get('home_dir', f'/home/{username}')
 
-        for cmd in scene['commands']:
-            if random.random() < 0.10: continue 
+        # Draw the whole scene's dropout and pacing up front
+        rand = self._rng.random
+        commands = [cmd for cmd in scene['commands'] if rand() >= 0.10]
+        delays = [2 + 3 * rand() for _ in commands]  # uniform(2, 5)
+        if commands:
+            self._write_bash_history_bulk(username, home, "\n".join(commands) + "\n")
 
-            self._write_bash_history(username, home, cmd)
-            
+        for cmd, delay in zip(commands, delays):
             # Narrative Persistence: If Alice pushes, trigger CI build
             if "git push" in cmd and username == "dev_alice":
                 if "trigger_build" not in state["global_events"]:
                     state["global_events"].append("trigger_build")
 
             try:
-                subprocess.Popen(
-                    ["sudo", "-u", username, "bash", "-c", f"cd {target_dir} && {cmd}"],
-                    preexec_fn=os.setsid, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-                )
+                # Backgrounded subshell keeps commands fire-and-forget as before.
+                # Quoted as single words so heredocs or stray quotes in a command
+                # can't leave the shared shell waiting on an unterminated construct.
+                self._run_in_shell(
+                    username, f"(cd {shlex.quote(target_dir)} && bash -c {shlex.quote(cmd)}) &\n")
             except Exception: pass
 
-            time.sleep(random.uniform(2, 5))
+            time.sleep(delay)
 
         # Update State
         if username not in state['users']: state['users'][username] = {}
@@ -138,12 +244,41 @@ class DeceptionEngine:
 
 if __name__ == "__main__":
     engine = DeceptionEngine()
-    while True:
+
+    # Self-pipe: a SIGTERM/SIGINT wakes the select() below instead of waiting out the sleep
+    wakeup_r, wakeup_w = os.pipe()
+    os.set_blocking(wakeup_r, False)
+    os.set_blocking(wakeup_w, False)
+    signal.set_wakeup_fd(wakeup_w)
+    stop = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stop.append(signum))
+
+    # Min-heap of (next_run, user): only personas that are due get evaluated
+    schedule = []
+    while not stop:
         personas = engine.load_personas()
-        for user, data in personas.items():
+        now = time.monotonic()
+        scheduled = {user for _, user in schedule}
+        for user in personas:
+            if user not in scheduled:
+                heapq.heappush(schedule, (now, user))
+
+        while schedule and schedule[0][0] <= now:
+            _, user = heapq.heappop(schedule)
+            data = personas.get(user)
+            if data is None:
+                continue  # Dropped from the spec
             if engine.is_active_window(data):
                 engine.execute_activity(user, data)
-        
-        # Behavioral Rhythm: Non-linear distribution (10–25 mins)
-        sleep_time = random.randint(600, 1500)
-        time.sleep(sleep_time)
\ No newline at end of file
+            # Behavioral Rhythm: Non-linear distribution (10–25 mins)
+            heapq.heappush(schedule, (time.monotonic() + engine._rng.randint(600, 1500), user))
+
+        timeout = max(0, schedule[0][0] - time.monotonic()) if schedule else 600
+        if select.select([wakeup_r], [], [], timeout)[0]:
+            try:
+                os.read(wakeup_r, 512)
+            except BlockingIOError:
+                pass
+
+    engine.close()
@@ -206,7 +206,7 @@ setup_venv() {
     if [[ -f "requirements.txt" ]]; then
         "$VENV_DIR/bin/pip" install -r requirements.txt -q
     else
-        "$VENV_DIR/bin/pip" install google-generativeai -q
+        "$VENV_DIR/bin/pip" install "google-generativeai>=0.7.0" -q
     fi
 
     log_info "  - Dependencies installed successfully"
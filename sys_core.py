@@ -64,6 +64,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# [minute bucket, local hour]. is_active_window asks once per persona per
+# cycle, but the hour only changes on a minute boundary.
+_hour_cache = [None, 0]
+
+def current_hour():
+    """Local hour, read from the clock at most once a minute."""
+    bucket = int(time.time()) // 60
+    if bucket != _hour_cache[0]:
+        _hour_cache[:] = [bucket, datetime.now().hour]
+    return _hour_cache[1]
+
 # Load .env manually if python-dotenv not present
 def load_env():
     config_dir = os.getenv("CONFIG_DIR", ".")
@@ -97,6 +108,9 @@ class SystemMonitor:
 
         # Initialize Content Manager (Modular Asset Storage)
         self.content_manager = ContentManager(self.llm_provider) if self.use_llm else None
+        if self.content_manager:
+            # Scene prompts read the "llm" intensity settings from config.json
+            self.llm_provider.config = self.content_manager.config
 
         # Track last timestamp to prevent collision in fast execution
         self.last_history_timestamp = 0
@@ -247,12 +261,12 @@ class SystemMonitor:
         start_hour, end_hour = persona_data.get('work_hours', [9, 17])
         probability = persona_data.get('probability', 0.5)
         
-        current_hour = datetime.now().hour
+        hour = current_hour()
         
         if start_hour > end_hour:
-             is_working_hours = current_hour >= start_hour or current_hour <= end_hour
+             is_working_hours = hour >= start_hour or hour <= end_hour
         else:
-            is_working_hours = start_hour <= current_hour <= end_hour
+            is_working_hours = start_hour <= hour <= end_hour
 
         if is_working_hours:
             return random.random() < probability
@@ -260,8 +274,14 @@ class SystemMonitor:
             return random.random() < 0.05
 
     # --- Layer 2: Script Picker (Hybrid Static/LLM) ---
-    def select_scene(self, persona_name, persona_data, context=None, force_llm=False):
-        """Selects a scene based on weighted categories or Calls LLM."""
+    def select_scene(self, persona_name, persona_data, context=None, force_llm=False, defer=False):
+        """
+        Selects a scene based on weighted categories or Calls LLM.
+
+        With defer, an LLM-bound pick is not generated here but returned as an
+        ("LLM_SCENE", context) or ("LLM_CONTEXT", context_state) request, for run() to
+        resolve together with the other personas' requests.
+        """
 
         # 1. Decide whether to use LLM (Contextual Injection)
         should_use_llm = self.use_llm and (force_llm or random.random() < 0.5 or not persona_data.get('scenes'))
@@ -271,7 +291,7 @@ class SystemMonitor:
 
             # === ENHANCED: Use SPADE Prompt Engine ===
             if ENHANCED_MODE and self.prompt_engine and self.adaptive_selector:
-                return self._generate_scene_with_spade(persona_name, persona_data, context)
+                return self._generate_scene_with_spade(persona_name, persona_data, context, defer)
 
             # Construct rich context for the basic prompt engine
             if not context:
@@ -288,6 +308,8 @@ class SystemMonitor:
                     "recent_history": self.state.get('users', {}).get(persona_name, {}).get('last_scene', "None")
                 }
 
+            if defer:
+                return ("LLM_SCENE", context)
             return self.llm_provider.generate_scene(persona_name, persona_data, context)
 
         # 2. Fallback to Static Selection
@@ -315,7 +337,7 @@ class SystemMonitor:
 
         return random.choice(pool)
 
-    def _generate_scene_with_spade(self, persona_name, persona_data, context):
+    def _generate_scene_with_spade(self, persona_name, persona_data, context, defer=False):
         """Generate scene using SPADE-style structured prompts."""
         # Build context state
         current_day = 1
@@ -346,11 +368,22 @@ class SystemMonitor:
             fingerprint_detected=fingerprint_detected
         )
 
+        # Deferred prompts are built together in _resolve_scene_requests
+        if defer:
+            return ("LLM_CONTEXT", context_state)
+
         # Generate adaptive prompt
         prompt = self.adaptive_selector.generate_adaptive_prompt(persona_name, context_state)
+        key = self.adaptive_selector.last_prompt_key
+        cached = self.adaptive_selector.lookup(key)
+        if cached is not None:
+            return cached
 
         # Call LLM with enhanced prompt
-        return self.llm_provider._call_llm(prompt)
+        scene = self.llm_provider._call_llm(prompt)
+        if scene:
+            self.adaptive_selector.store(key, scene)
+        return scene
 
     # --- Layer 3: Story Planner (Narrative Injection) ---
     def get_monthly_task(self):
@@ -394,16 +427,14 @@ class SystemMonitor:
         """Scans executed commands against Dynamic Rules."""
         if not self.content_manager: return
 
-        triggers = self.content_manager.get_triggers()
-        for rule in triggers:
+        # Rules whose pattern occurs in any of my commands (one joined scan)
+        matched = self.content_manager.match_triggers("\n".join(commands))
+        for rule in matched:
             # If I am the source
             if rule["source"] == persona_name:
-                # Check if my command matches pattern
-                for cmd in commands:
-                    if rule["pattern"] in cmd:
-                         if rule["event"] not in self.state["global_events"]:
-                             logger.info(f"DYNAMIC TRIGGER: {persona_name} matched [{rule['pattern']}] -> Firing [{rule['event']}]")
-                             self.state["global_events"].append(rule["event"])
+                if rule["event"] not in self.state["global_events"]:
+                    logger.info(f"DYNAMIC TRIGGER: {persona_name} matched [{rule['pattern']}] -> Firing [{rule['event']}]")
+                    self.state["global_events"].append(rule["event"])
 
     # --- Execution Core ---
     def run(self, strategy_flag=None):
@@ -457,6 +488,9 @@ class SystemMonitor:
         logger.info(f"Day {current_day} Focus: {daily_task_info.get('focus')}")
 
         targets = list(self.personas.items())
+        # (name, scene) per persona that acts this cycle. LLM-bound scenes are
+        # left as requests and generated together once every persona is planned.
+        planned = []
         
         for name, data in targets:
             # ==========================================
@@ -520,7 +554,7 @@ class SystemMonitor:
                                 "story_arc": self.content_manager.get_story_arc(name) if self.content_manager else "Generic",
                                 "recent_history": self.state.get('users', {}).get(name, {}).get('last_scene', "None")
                             }
-                            scene = self.select_scene(name, data, context=context, force_llm=True) 
+                            scene = self.select_scene(name, data, context=context, force_llm=True, defer=True)
                     elif isinstance(result, tuple):
                         if result[0] == name:
                             scene = result[1]
@@ -546,24 +580,32 @@ class SystemMonitor:
                         "story_arc": self.content_manager.get_story_arc(name) if self.content_manager else "Generic",
                         "recent_history": self.state.get('users', {}).get(name, {}).get('last_scene', "None")
                      }
-                     scene = self.select_scene(name, data, context=context)
+                     scene = self.select_scene(name, data, context=context, defer=True)
 
             if not scene:
                 continue
 
+            planned.append((name, scene))
+
+        # ==========================================
+        # STEP 5: BATCHED GENERATION (One round trip for all personas)
+        # ==========================================
+        planned = self._resolve_scene_requests(planned)
+
+        for name, scene in planned:
+            if not scene:
+                continue
+
             # ==========================================
-            # STEP 5: NOISE INJECTION (The Humanizer)
+            # STEP 6: NOISE INJECTION (The Humanizer)
             # ==========================================
             if strategy_flag == "hybrid" or strategy_flag == "noise":
                  scene['commands'] = self.strategy_manager.apply_noise(scene['commands'])
 
             # ==========================================
-            # STEP 6: EXECUTION (With Feedback Loop)
+            # STEP 7: EXECUTION (With Feedback Loop)
             # ==========================================
             self.execute_scene_with_feedback(name, scene)
-            
-            if forced_run:
-                 pass
         
         # Increment Day at end of full cycle? OR handle externally.
         # For simulation speed, we might increment day every N cycles.
@@ -572,6 +614,48 @@ class SystemMonitor:
         self._advance_simulation_time()
         logger.info("--- Cycle Complete ---")
 
+    def _resolve_scene_requests(self, planned):
+        """Replaces deferred select_scene requests in planned with generated scenes."""
+        scene_jobs = [i for i, (_, scene) in enumerate(planned) if isinstance(scene, tuple) and scene[0] == "LLM_SCENE"]
+        spade_jobs = [i for i, (_, scene) in enumerate(planned) if isinstance(scene, tuple) and scene[0] == "LLM_CONTEXT"]
+        planned = list(planned)
+
+        # A failed batch only drops its own personas' scenes for this cycle
+        if scene_jobs:
+            requests = [(planned[i][0], self.personas.get(planned[i][0], {}), planned[i][1][1]) for i in scene_jobs]
+            try:
+                scenes = self.llm_provider.generate_scenes(requests)
+            except Exception as e:
+                logger.error(f"Batched scene generation failed: {e}")
+                scenes = [None] * len(scene_jobs)
+            for i, scene in zip(scene_jobs, scenes):
+                planned[i] = (planned[i][0], scene)
+        if spade_jobs:
+            try:
+                scenes = self._generate_spade_scenes(
+                    [planned[i][0] for i in spade_jobs], [planned[i][1][1] for i in spade_jobs])
+            except Exception as e:
+                logger.error(f"Batched SPADE scene generation failed: {e}")
+                scenes = [None] * len(spade_jobs)
+            for i, scene in zip(spade_jobs, scenes):
+                planned[i] = (planned[i][0], scene)
+        return planned
+
+    def _generate_spade_scenes(self, persona_names, context_states):
+        """SPADE scenes for several personas: prompts built in one batch, cached ones reused."""
+        selector = self.adaptive_selector
+        prompts = selector.generate_adaptive_prompts(persona_names, context_states)
+        keys = [selector.prompt_key(prompt) for prompt in prompts]
+        scenes = [selector.lookup(key) for key in keys]
+
+        misses = [j for j, scene in enumerate(scenes) if scene is None]
+        if misses:
+            for j, scene in zip(misses, self.llm_provider._call_llm_many([prompts[j] for j in misses])):
+                if scene:
+                    selector.store(keys[j], scene)
+                scenes[j] = scene
+        return scenes
+
     def _advance_simulation_time(self):
         """Simulates passage of time."""
         logger.info("[SIMULATION] Advancing time (Simulated)...")
@@ -751,9 +835,13 @@ class SystemMonitor:
                         current_time = self.last_history_timestamp + random.randint(1, 4)
                     self.last_history_timestamp = current_time
 
-                    with open(history_file, "a") as hf:
-                        hf.write(f"#{current_time}\n")
-                        hf.write(f"{cmd}\n")
+                    # One raw O_APPEND write per entry, timestamp and command together.
+                    # 0o644 as open(..., "a") gave: the persona must be able to read it.
+                    fd = os.open(history_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    try:
+                        os.write(fd, f"#{current_time}\n{cmd}\n".encode("utf-8", "replace"))
+                    finally:
+                        os.close(fd)
                 except Exception as e:
                     logger.warning(f"Failed to update bash_history: {e}")
 
@@ -803,6 +891,10 @@ class SystemMonitor:
             self.state['users'][username] = {}
         self.state['users'][username]['last_scene'] = scene['name']
         self.state['users'][username]['last_run'] = time.time()
+
+        # Persona repos are only created once a scene actually runs
+        if self.content_manager:
+            self.content_manager.ensure_git_environment()
         
         # Build context for interpolation
         persona = self.personas.get(username, {})
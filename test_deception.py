@@ -17,10 +17,17 @@ import unittest
 import tempfile
 import shutil
 from datetime import datetime
+from unittest import mock
 
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+try:
+    import google.generativeai  # noqa: F401
+    HAS_GENAI = True
+except ImportError:
+    HAS_GENAI = False
+
 
 class TestAntiFingerprintManager(unittest.TestCase):
     """Test anti-fingerprinting capabilities."""
@@ -58,6 +65,24 @@ class TestAntiFingerprintManager(unittest.TestCase):
         self.assertNotIn("hostfs", content.lower())
         self.assertNotIn("uml", content.lower())
 
+    def test_dynamic_files_are_consistent(self):
+        """Test uptime never goes backwards and burst reads share meminfo."""
+        first = float(self.manager.get_proc_file("/proc/uptime").split()[0])
+        second = float(self.manager.get_proc_file("/proc/uptime").split()[0])
+        self.assertGreaterEqual(second, first)
+
+        self.assertEqual(
+            self.manager.get_proc_file("/proc/meminfo"),
+            self.manager.get_proc_file("/proc/meminfo")
+        )
+
+    def test_proc_file_bytes(self):
+        """Test the bytes accessor matches the text content and is reused."""
+        data = self.manager.get_proc_file_bytes("/proc/version")
+        self.assertEqual(data, self.manager.get_proc_file("/proc/version").encode("utf-8"))
+        self.assertIs(data, self.manager.get_proc_file_bytes("/proc/version"))
+        self.assertIsNone(self.manager.get_proc_file_bytes("/proc/nonexistent"))
+
     def test_os_release_generation(self):
         """Test /etc/os-release generation."""
         content = self.manager.get_system_file("/etc/os-release")
@@ -104,6 +129,17 @@ class TestAttackerBehaviorDetector(unittest.TestCase):
         # Should now have elevated threat level
         self.assertNotEqual(self.detector.get_threat_level(), "none")
 
+    def test_detection_log_is_bounded(self):
+        """Test that the detection log is capped but totals keep counting."""
+        total = self.detector.DETECTION_LOG_SIZE + 5
+        for _ in range(total):
+            self.detector.analyze_command("cat /proc/self/exe")
+
+        summary = self.detector.get_detection_summary()
+        self.assertEqual(len(self.detector.detection_log), self.detector.DETECTION_LOG_SIZE)
+        self.assertEqual(summary['total_detections'], total)
+        self.assertEqual(len(summary['recent_detections']), 10)
+
 
 class TestBashHistoryManager(unittest.TestCase):
     """Test bash history management."""
@@ -141,6 +177,15 @@ class TestBashHistoryManager(unittest.TestCase):
         # Should have timestamp line
         self.assertIn("#", content)
 
+    def test_get_recent_commands(self):
+        """Test reading the tail of a long history file."""
+        for i in range(2000):
+            self.manager.history_buffer.append((1704103200, f"echo {i}"))
+        self.manager.flush_to_file()
+
+        recent = self.manager.get_recent_commands(5)
+        self.assertEqual(recent, [f"echo {i}" for i in range(1995, 2000)])
+
     def test_typo_generation(self):
         """Test typo generation for realism."""
         # Generate many typos to test probability
@@ -208,6 +253,54 @@ class TestSPADEPromptEngine(unittest.TestCase):
         self.assertIn("Developer", prompt_alice)
         self.assertIn("Administrator", prompt_bob)
 
+    def test_select_modes_matches_select_mode(self):
+        """Test batched mode selection draws the same modes as one at a time."""
+        import random
+        from PromptEngine import AdaptivePromptSelector, ContextState
+        contexts = [
+            ContextState(day, "Arc", "Task", [], [], "api", "passing", level, fingerprint)
+            for day, (level, fingerprint) in enumerate(
+                [("none", False), ("high", False), ("critical", False), ("none", True)] * 10)
+        ]
+        selector = AdaptivePromptSelector(self.engine)
+
+        selector._rng = random.Random(42)
+        batched = selector.select_modes(contexts)
+        selector._rng = random.Random(42)
+        single = [selector.select_mode(context) for context in contexts]
+
+        self.assertEqual(batched, single)
+
+    def test_build_prompts_batch_matches_build_prompt(self):
+        """Test batched prompts are byte-identical to single builds."""
+        import random
+        from PromptEngine import ContextState
+        names = ["dev_alice", "sys_bob", "svc_ci", "qa_carol", "dev_alice"]
+        contexts = [
+            ContextState(day, "Arc", "Task", ["ls"] * day, [], "api", "passing", level, fingerprint)
+            for day, (level, fingerprint) in enumerate(
+                [("none", False), ("high", True), ("none", True), ("critical", False), ("high", True)], 1)
+        ]
+        modes = ["normal", "quick", "anomaly", "deep_work", "unknown"]
+
+        self.engine._rng = random.Random(7)
+        batched = self.engine.build_prompts_batch(names, contexts, modes)
+        self.engine._rng = random.Random(7)
+        single = [self.engine.build_prompt(n, c, m) for n, c, m in zip(names, contexts, modes)]
+
+        self.assertEqual(batched, single)
+
+    def test_generate_adaptive_prompts(self):
+        """Test batched adaptive prompts record one history entry per persona."""
+        from PromptEngine import AdaptivePromptSelector
+        selector = AdaptivePromptSelector(self.engine)
+        prompts = selector.generate_adaptive_prompts(["dev_alice", "sys_bob"], [self.context] * 2)
+
+        self.assertEqual(len(prompts), 2)
+        self.assertIn("Alice Chen", prompts[0])
+        self.assertIn("Robert Martinez", prompts[1])
+        self.assertEqual(len(selector.threat_history), 2)
+
 
 class TestUserArtifactGenerator(unittest.TestCase):
     """Test user artifact generation."""
@@ -291,6 +384,228 @@ class TestMetricsCollector(unittest.TestCase):
         self.assertEqual(summary['total_commands'], 1)
 
 
+class TestContentManager(unittest.TestCase):
+    """Test the content cache store."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.old_config_dir = os.environ.get("CONFIG_DIR")
+        os.environ["CONFIG_DIR"] = self.temp_dir
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.close()
+        if self.old_config_dir is None:
+            os.environ.pop("CONFIG_DIR", None)
+        else:
+            os.environ["CONFIG_DIR"] = self.old_config_dir
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def new_manager(self):
+        from ContentManager import ContentManager
+        manager = ContentManager(None)
+        self.managers.append(manager)
+        return manager
+
+    def test_close_stops_flusher(self):
+        """Test close() stops the background flush thread and flushes."""
+        manager = self.new_manager()
+        manager.cache["assets"]["vuln_commands"].append("chmod 777 /srv")
+        manager._dirty_sections.add("assets")
+        manager.close()
+        manager.close()
+
+        self.assertFalse(manager._flush_thread.is_alive())
+        with open(manager._section_files["assets"]) as f:
+            self.assertIn("chmod 777 /srv", f.read())
+
+    def test_config_not_loaded_on_construction(self):
+        """Test the background flusher doesn't force config.json to load."""
+        with open(os.path.join(self.temp_dir, "config.json"), "w") as f:
+            json.dump({"simulation": {"cache_flush_interval": 0.5}}, f)
+        manager = self.new_manager()
+        self.assertIsNone(manager._config)
+        self.assertEqual(manager._flush_interval(), 5.0)
+        manager.config
+        self.assertEqual(manager._flush_interval(), 0.5)
+
+    def test_partial_section_files_reload(self):
+        """Test a restart with only some sections on disk keeps the defaults."""
+        manager = self.new_manager()
+        manager.cache["personas"] = {"dev_alice": {"home_dir": "/home/dev_alice"}}
+        manager._dirty_sections.add("personas")
+        manager.close()
+        self.assertFalse(os.path.exists(manager._section_files["forecast_queue"]))
+
+        reloaded = self.new_manager()
+        self.assertIn("dev_alice", reloaded.cache["personas"])
+        self.assertIsNone(reloaded.get_next_forecast_scene())
+        self.assertEqual(reloaded.cache["assets"]["vuln_commands"], [])
+
+    def test_template_mutation_does_not_leak(self):
+        """Test noise applied to a returned template stays out of the store."""
+        with open(os.path.join(self.temp_dir, "templates.json"), "w") as f:
+            json.dump({"cache": [{"name": "Cached", "commands": ["uptime"]}]}, f)
+        manager = self.new_manager()
+        scene = manager.get_template("cache")
+        scene["commands"] = scene["commands"] + ["ls -la"]
+        scene["commands"].append("w")
+        manager.config["simulation"] = {"noise": True}
+
+        self.assertEqual(manager.get_template("cache")["commands"], ["uptime"])
+        other = self.new_manager()
+        self.assertEqual(other.get_template("cache")["commands"], ["uptime"])
+        self.assertNotIn("simulation", other.config)
+
+
+@unittest.skipUnless(HAS_GENAI, "google-generativeai not installed")
+class TestLLMProvider(unittest.TestCase):
+    """Test LLM prompt construction and scene generation (no network)."""
+
+    HOME = "/home/dev_alice"
+    PATHS = {
+        "current_workspace": "/home/dev_alice/repos/payments",
+        "active_projects": ["/home/dev_alice/repos/payments", "/home/dev_alice/repos/web"],
+        "archived_projects": ["/home/dev_alice/archive/legacy-billing"],
+        "personal_dirs": ["/home/dev_alice/notes"],
+    }
+    CONTEXT = {
+        "monthly_plan": {"narrative_arc": "Payments Rewrite", "current_day": "12", "daily_task": "Add retries"},
+        "recent_history": "Fix login redirect",
+    }
+
+    def mock_provider(self, config=None):
+        from LLM_Provider import LLMProvider
+        with mock.patch.dict(os.environ, {"GEMINI_API_KEY": ""}):
+            return LLMProvider(config=config)
+
+    def expected_dev_tail(self, is_deep_work):
+        """The dev scene tail as the original f-string prompt built it."""
+        name, home = "dev_alice", self.HOME
+        current_workspace = self.PATHS["current_workspace"]
+        active_projects = self.PATHS["active_projects"]
+        archived_projects = self.PATHS["archived_projects"]
+        personal_dirs = self.PATHS["personal_dirs"]
+        ctx_arc, ctx_day, ctx_task = "Payments Rewrite", "12", "Add retries"
+        recent_history = "Fix login redirect"
+        role_description = f"User: {name}\nHome Directory: {home}\nCurrent Workspace: {current_workspace}\nRole Type: Software Developer"
+        specific_instructions = f"""
+            **BEHAVIOR**:
+            - You are writing code, compiling, or debugging.
+            - Use realistic tools: git, vim/nano, make, docker, kubectl, python, go.
+            - If the task is 'Refactor', show `mv`, `sed`, or heavy git activity.
+            - If the task is 'Feature', show `mkdir`, `touch`, and content injection.
+            
+            **DYNAMIC WORKING ENVIRONMENT**:
+            - Active Projects: {', '.join(active_projects)}
+            - Archived Work: {', '.join(archived_projects)}
+            - Personal Space: {', '.join(personal_dirs)}
+            - Current Focus: {current_workspace}
+            
+            **PATH USAGE RULES**:
+            - Primary workspace: {current_workspace}
+            - Create subdirectories if needed (mkdir -p)
+            - Use project-specific paths from the active projects list
+            - Reference archived projects for context/history
+            - NEVER use generic paths like /tmp/test or /home/user/project
+            """
+        planning_context = f"""
+        **CURRENT OBJECTIVE (Monthly Arc)**: "{ctx_arc}"
+        **TODAY'S PROGRESS**: Day {ctx_day}
+        **SPECIFIC TASK**: "{ctx_task}"
+
+        *Your generated command history must DIRECTLY contribute to this specific task.*
+        """
+        if is_deep_work:
+            work_instruction = """
+            **MODE: DEEP WORK (High Detail)**
+            - The user is doing substantial work.
+            - GENERATE ACTUAL CONTENT: Use `cat <<EOF > filename` to create realistic code/config files.
+            - The code/config should be syntactically correct and relevant to the Task.
+            - Don't just `echo "code"`, write a small python function or valid json config.
+            """
+        else:
+            work_instruction = """
+            **MODE: STANDARD ACTIVITY**
+            - Efficient command usage.
+            - Navigation, checking status, short edits, git operations.
+            """
+        prompt = f"""
+        ## 1. PERSONA PROFILE
+        {role_description}
+        {specific_instructions}
+
+        ## 2. PLANNING CONTEXT
+        {planning_context}
+
+        ## 3. HISTORY
+        Last Activity: {recent_history}
+
+        ## 4. INSTRUCTIONS
+        {work_instruction}
+        """
+        return prompt
+
+    def test_scene_tail_matches_fstring_prompt(self):
+        """Test the compiled scene templates render the original prompt text."""
+        for chance, is_deep_work in ((0.0, False), (1.0, True)):
+            provider = self.mock_provider({"llm": {"deep_coding_chance": chance}})
+            provider.generate_dynamic_paths = lambda *args: self.PATHS
+            tail = provider._scene_prompt_tail("dev_alice", {"home_dir": self.HOME}, self.CONTEXT)
+            self.assertEqual(tail, self.expected_dev_tail(is_deep_work))
+
+    def test_generate_scenes_with_fake_model(self):
+        """Test batched scene generation end to end against a fake model."""
+        import LLM_Provider
+        paths_reply = {"dev_alice": self.PATHS}
+        scene_reply = {"name": "Add retry decorator", "category": "Routine",
+                       "zone": "/home/dev_alice/repos/payments", "commands": ["git status", ""]}
+        prompts = []
+
+        class FakeModel:
+            def __init__(self, name, **kwargs):
+                self.kwargs = kwargs
+
+            def reply(self, prompt):
+                prompts.append((self.kwargs.get("system_instruction"), prompt))
+                text = json.dumps(paths_reply if "**USERS:**" in prompt else scene_reply)
+                return mock.Mock(text=text)
+
+            def generate_content(self, prompt, **kwargs):
+                return self.reply(prompt)
+
+            async def generate_content_async(self, prompt, **kwargs):
+                return self.reply(prompt)
+
+        genai = LLM_Provider.genai
+        with mock.patch.object(LLM_Provider, "_configure_once"), \
+                mock.patch.object(genai, "GenerativeModel", FakeModel), \
+                mock.patch.object(genai, "embed_content_async", side_effect=RuntimeError, create=True):
+            provider = LLM_Provider.LLMProvider(api_key="test-key", config={"llm": {"deep_coding_chance": 0.0}})
+            scenes = provider.generate_scenes([
+                ("dev_alice", {"home_dir": self.HOME}, self.CONTEXT),
+                ("dev_alice", {"home_dir": self.HOME}, None),
+            ])
+
+        self.assertEqual(len(scenes), 2)
+        for scene in scenes:
+            self.assertEqual(scene["commands"], ["git status"])
+        # One prompt for both personas' paths, then one per scene
+        self.assertEqual(len(prompts), 3)
+        self.assertIn("**USERS:**", prompts[0][1])
+        for preamble, prompt in prompts[1:]:
+            self.assertEqual(preamble, LLM_Provider.LLMProvider._SCENE_PREAMBLE)
+            self.assertIn("/home/dev_alice/repos/payments", prompt)
+
+    def test_config_defaults_to_empty(self):
+        """Test a provider built without config still renders scene prompts."""
+        provider = self.mock_provider()
+        provider.generate_dynamic_paths = lambda *args: self.PATHS
+        self.assertEqual(provider.config, {})
+        self.assertIn("PERSONA PROFILE", provider._scene_prompt_tail("dev_alice", {"home_dir": self.HOME}))
+
+
 class TestIntegration(unittest.TestCase):
     """Integration tests for the full system."""
 
@@ -339,6 +654,8 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestSPADEPromptEngine))
     suite.addTests(loader.loadTestsFromTestCase(TestUserArtifactGenerator))
     suite.addTests(loader.loadTestsFromTestCase(TestMetricsCollector))
+    suite.addTests(loader.loadTestsFromTestCase(TestContentManager))
+    suite.addTests(loader.loadTestsFromTestCase(TestLLMProvider))
     suite.addTests(loader.loadTestsFromTestCase(TestIntegration))
 
     # Run with verbosity